@@ -0,0 +1,53 @@
+# backtest.py
+# Rejeu historique des produits EP / ELT / NF sur les rendements mensuels MSCI World
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from moteur import capital_chemins, mensualite_nettoyee_batch
+
+# Serie mensuelle attendue : une colonne "date" et une colonne "rendement"
+# (rendement total du mois, en %), au format CSV ou Parquet
+CHEMIN_MSCI = Path(__file__).parent / "data" / "msci_world_mensuel.csv"
+CENTILES = (5, 25, 50, 75, 95)
+
+
+def charger_rendements_msci(chemin=CHEMIN_MSCI):
+    chemin = Path(chemin)
+    if chemin.suffix == ".parquet":
+        serie = pd.read_parquet(chemin, columns=["date", "rendement"])
+    else:
+        serie = pd.read_csv(chemin, usecols=["date", "rendement"])
+    serie["date"] = pd.to_datetime(serie["date"])
+    serie = serie.dropna().sort_values("date").reset_index(drop=True)
+    return serie
+
+
+def backtest_historique(rendements, mensuel, duree, frais_entree, frais_gestion, taxe_lib=None, taxe_versement=0.0, montant_initial=0.0, split_60=True, dates=None, centiles=CENTILES):
+    # Une fenetre par date de depart possible. sliding_window_view donne une vue
+    # (n_fenetres, n_mois) sans copie : le mois m de toutes les fenetres est une
+    # tranche contigue de la serie, evaluee en une seule operation.
+    rendements = np.asarray(rendements, dtype=np.float64)
+    n_mois = int(duree) * 12
+    if n_mois > rendements.size:
+        raise ValueError(f"Historique trop court : {rendements.size} mois pour un horizon de {n_mois} mois")
+    facteurs = 1 + rendements / 100 - frais_gestion / 12 / 100
+    fenetres = sliding_window_view(facteurs, n_mois)
+    P_net = float(mensualite_nettoyee_batch(mensuel, frais_entree, taxe_versement))
+    finaux = capital_chemins(fenetres, P_net, montant_initial, taxe_lib, split_60)
+    if dates is None:
+        dates = np.arange(rendements.size)
+    debuts = np.asarray(dates)[: finaux.size]
+    pire, meilleur = int(np.argmin(finaux)), int(np.argmax(finaux))
+    return {
+        "n_fenetres": int(finaux.size),
+        "centiles": {c: round(float(v), 2) for c, v in zip(centiles, np.percentile(finaux, centiles))},
+        "moyenne": round(float(finaux.mean()), 2),
+        "pire": (debuts[pire], round(float(finaux[pire]), 2)),
+        "meilleur": (debuts[meilleur], round(float(finaux[meilleur]), 2)),
+        "rendement_annuel_moyen": round(float(rendements.mean() * 12), 2),
+        "dates_debut": debuts,
+        "capitaux_finaux": finaux,
+    }
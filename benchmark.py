@@ -0,0 +1,323 @@
+# benchmark.py
+# Mesures reproductibles du moteur de projection, du rerun complet, du PDF et du
+# service HTTP :
+#   python benchmark.py --sortie bench_nouveau.json --comparer bench_ancien.json
+import argparse
+import asyncio
+import datetime
+import io
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+import moteur
+from cache_pdf import CachePdf
+from export_echeancier import FORMATS, echeancier_par_blocs, ecrire_echeancier
+from graphiques_pdf import png_courbe
+from recap_pdf import recap_pdf_octets
+
+DOSSIER = Path(__file__).parent
+APPLICATION = DOSSIER / "simulateur_ep_elt_streamlit_v17_final.py"
+TAILLES_LOT = (1, 100, 10_000, 100_000, 1_000_000)
+GRAINE = 20240601
+SEUIL_REGRESSION = 0.10
+# Objectif de calculateur_batch sur 100 000 contrats face a la boucle scalaire. Ecart
+# accepte : ~40-50x mesure sur un coeur (NumPy pur, ~35 ufuncs par bloc pour rester
+# identique au centime pres a calculateur) ; le rapport donne l'acceleration mesuree
+OBJECTIF_ACCELERATION = 100
+
+
+def parametres_realistes(n, rng):
+    # Ages 18-60, versements et frais dans les bornes des champs, NF jusqu'a 99 ans
+    age = rng.integers(18, 61, n)
+    return {
+        "age": age,
+        "duree": moteur.AGE_TERME - age,
+        "montant_ep": rng.uniform(30.0, moteur.PLAFONDS_MENSUELS["EP"], n).round(2),
+        "taux": rng.uniform(3.0, 10.0, n).round(2),
+        "frais_entree": rng.uniform(0.0, 5.0, n).round(2),
+        "frais_gestion": rng.uniform(0.5, 2.5, n).round(2),
+        "montant_nf": rng.uniform(10.0, 5000.0, n).round(0),
+        "duree_nf": rng.integers(1, 100, n),
+        "montant_initial_nf": rng.uniform(0.0, 100_000.0, n).round(-2),
+    }
+
+
+def mesurer(fonction, repetitions, duree_min=0.05):
+    # Comme timeit : chaque mesure enchaine assez d'appels pour durer duree_min
+    appels = 1
+    while True:
+        debut = time.perf_counter()
+        for _ in range(appels):
+            fonction()
+        if time.perf_counter() - debut >= duree_min or appels >= 1 << 20:
+            break
+        appels *= 2
+    temps = []
+    for _ in range(repetitions):
+        debut = time.perf_counter()
+        for _ in range(appels):
+            fonction()
+        temps.append((time.perf_counter() - debut) / appels * 1000)
+    return {"median_ms": statistics.median(temps), "min_ms": min(temps), "repetitions": repetitions, "appels": appels}
+
+
+def bench_calculateur(rng, repetitions):
+    p = parametres_realistes(1000, rng)
+    lignes = list(zip(*(p[k].tolist() for k in ("montant_ep", "duree", "frais_entree", "frais_gestion", "taux"))))
+
+    def boucle():
+        for m, d, fe, fg, t in lignes:
+            moteur.calculateur(m, d, fe, fg, t, **moteur.FISCALITE["EP"])
+    resultat = mesurer(boucle, repetitions)
+    return {"calculateur_scalaire_1000": resultat}
+
+
+def bench_calculateur_batch(rng, repetitions, tailles):
+    resultats = {}
+    for n in tailles:
+        p = parametres_realistes(n, rng)
+        resultats[f"calculateur_batch_{n}"] = mesurer(
+            lambda: moteur.calculateur_batch(p["montant_ep"], p["duree"], p["frais_entree"], p["frais_gestion"], p["taux"], **moteur.FISCALITE["EP"]),
+            repetitions,
+        )
+    return resultats
+
+
+def bench_plot_evolution(repetitions):
+    resultats = {}
+    for nom, duree, fiscalite in (("ep_44_ans", 44, moteur.FISCALITE["EP"]), ("nf_99_ans", 99, moteur.FISCALITE["NF"])):
+        resultats[f"plot_evolution_{nom}"] = mesurer(lambda: moteur.plot_evolution(150.0, duree, 3.0, 1.25, 8.0, **fiscalite), repetitions)
+    return resultats
+
+
+def bench_courbes_batch(rng, repetitions, n=1000):
+    # Courbes NF d'un portefeuille selon la granularite (un point par mois, trimestre ou an)
+    p = parametres_realistes(n, rng)
+    return {
+        f"courbe_batch_{n}_{granularite}": mesurer(
+            lambda: moteur.courbe_evolution(p["montant_nf"], p["duree_nf"], p["frais_entree"], p["frais_gestion"], p["taux"], montant_initial=p["montant_initial_nf"], pas=pas, **moteur.FISCALITE["NF"]),
+            repetitions,
+        )
+        for granularite, pas in moteur.GRANULARITES.items()
+    }
+
+
+def bench_export(rng, repetitions, n=100):
+    # Echeanciers NF sur 99 ans d'un lot de clients (118 800 lignes), ecrits en memoire
+    p = parametres_realistes(n, rng)
+    parametres = dict(mensuel=p["montant_nf"], duree=99, frais_entree=p["frais_entree"], frais_gestion=p["frais_gestion"], taux_interet=p["taux"], montant_initial=p["montant_initial_nf"], **moteur.FISCALITE["NF"])
+    return {
+        f"export_echeancier_{n}_clients_{format}": mesurer(lambda: ecrire_echeancier(echeancier_par_blocs(parametres, p["age"]), io.BytesIO(), format), repetitions)
+        for format in FORMATS
+    }
+
+
+def bench_pdf(repetitions):
+    donnees = dict(
+        prenom="Jean", nom="Dupont", produits=["EP", "ELT", "Epargne non fiscale"], taux_msci=8.53,
+        date_rdv=datetime.date(2025, 1, 15), age=23, duree=44, duree_nf=10,
+        montant_ep=87.5, net_mensuel_ep=61.25, avantage_ep=315.0, cap_ep=80491.19, total_avantage_ep=13860.0,
+        montant_elt=100.0, net_mensuel_elt=70.0, avantage_elt=360.0, cap_elt=114803.28, total_avantage_elt=15840.0,
+        montant_nf=150.0, total_investi_nf=18000.0, cap_nf=24343.52,
+    )
+    cache = CachePdf(dossier=None)
+    cache.obtenir(donnees)
+    # Avec les parametres des courbes : images rendues une fois puis reprises du cache
+    avec_graphiques = dict(donnees, taux_ep=5.0, frais_entree_ep=3.0, frais_gestion_ep=1.9, taux_elt=5.0, frais_entree_elt=3.0, frais_gestion_elt=1.0, taux_nf=8.0, frais_entree_nf=3.0, frais_gestion_nf=1.25, montant_initial_nf=0.0)
+    recap_pdf_octets(avec_graphiques)
+    montants = iter(np.resize(np.arange(3000, 30000) / 100, 1 << 21))
+    return {
+        "pdf_recap_3_produits": mesurer(lambda: recap_pdf_octets(donnees), repetitions),
+        "pdf_recap_3_produits_en_cache": mesurer(lambda: cache.obtenir(donnees), repetitions),
+        "pdf_recap_3_produits_graphiques": mesurer(lambda: recap_pdf_octets(avec_graphiques), repetitions),
+        "graphique_courbe_rendu": mesurer(lambda: png_courbe("EP", 23, float(next(montants)), 44, 3.0, 1.9, 5.0), repetitions),
+    }
+
+
+def bench_rerun(repetitions):
+    # Reruns du script via le harnais AppTest de Streamlit : un champ produit ne
+    # rejoue que son fragment, l'age rejoue toute la page
+    try:
+        from streamlit.testing.v1 import AppTest
+    except ImportError:
+        return {}
+    app = AppTest.from_file(str(APPLICATION), default_timeout=120)
+
+    def executer():
+        # Un rerun qui leve une exception ne mesure pas le chemin normal
+        app.run()
+        if app.exception:
+            raise RuntimeError(f"rerun en erreur : {app.exception[0].message}")
+    debut = time.perf_counter()
+    executer()
+    premier = (time.perf_counter() - debut) * 1000
+    ages = iter(np.resize(np.arange(18, 61), 10_000))
+    taux = iter(np.resize(np.arange(100, 2000) / 100, 10_000))
+
+    def changement_age():
+        app.slider(key="age").set_value(int(next(ages)))
+        executer()
+
+    def changement_taux_nf():
+        champ = next(c for c in app.number_input if c.label == "Taux NF (%)")
+        champ.set_value(float(next(taux)))
+        executer()
+    return {
+        "rerun_premier_affichage": {"median_ms": premier, "min_ms": premier, "repetitions": 1, "appels": 1},
+        "rerun_sans_changement": mesurer(executer, repetitions, duree_min=0),
+        "rerun_changement_age": mesurer(changement_age, repetitions, duree_min=0),
+        "rerun_changement_taux_nf": mesurer(changement_taux_nf, repetitions, duree_min=0),
+    }
+
+
+async def _requete_http(lecteur, ecrivain, chemin, corps):
+    ecrivain.write(f"POST {chemin} HTTP/1.1\r\nhost: bench\r\ncontent-type: application/json\r\ncontent-length: {len(corps)}\r\n\r\n".encode() + corps)
+    await ecrivain.drain()
+    entetes = await lecteur.readuntil(b"\r\n\r\n")
+    longueur = int(next(l.split(b":")[1] for l in entetes.lower().split(b"\r\n") if l.startswith(b"content-length")))
+    await lecteur.readexactly(longueur)
+    return int(entetes.split()[1])
+
+
+async def _charge_http(port, duree_s, concurrence, corps_lot, corps_clients):
+    # concurrence clients enchainent des projections unitaires pendant qu'un autre
+    # envoie des lots en continu ; latences en ms
+    fin = time.perf_counter() + duree_s
+    unitaires, lots = [], []
+
+    async def client(chemin, corps, latences):
+        lecteur, ecrivain = await asyncio.open_connection("127.0.0.1", port)
+        i = 0
+        while time.perf_counter() < fin:
+            debut = time.perf_counter()
+            statut = await _requete_http(lecteur, ecrivain, chemin, corps[i % len(corps)])
+            latences.append((time.perf_counter() - debut) * 1000)
+            assert statut == 200, statut
+            i += 1
+        ecrivain.close()
+    await asyncio.gather(
+        client("/projection/lot", [corps_lot], lots),
+        *(client("/projection", corps_clients[k::concurrence], unitaires) for k in range(concurrence)),
+    )
+    return unitaires, lots
+
+
+def bench_service(rng, duree_s=5.0, concurrence=16, taille_lot=100_000):
+    # Test de charge local du service HTTP (uvicorn sur un port libre) : latences
+    # p50 / p99 des projections unitaires pendant qu'un gros lot est calcule
+    try:
+        import uvicorn
+    except ImportError:
+        return {}
+    import service_http
+    serveur = uvicorn.Server(uvicorn.Config(service_http.application, host="127.0.0.1", port=0, log_level="warning"))
+    fil = threading.Thread(target=serveur.run, daemon=True)
+    fil.start()
+    while not serveur.started:
+        time.sleep(0.01)
+    port = serveur.servers[0].sockets[0].getsockname()[1]
+    p = parametres_realistes(max(taille_lot, 1000), rng)
+    colonnes = {"age": p["age"], "montant_ep": p["montant_ep"], "taux_ep": p["taux"], "montant_nf": p["montant_nf"], "duree_nf": p["duree_nf"], "montant_initial_nf": p["montant_initial_nf"]}
+    corps_lot = json.dumps({"clients": {nom: valeurs[:taille_lot].tolist() for nom, valeurs in colonnes.items()}}).encode()
+    corps_clients = [json.dumps({nom: valeurs[i].item() for nom, valeurs in colonnes.items()}).encode() for i in range(1000)]
+    try:
+        unitaires, lots = asyncio.run(_charge_http(port, duree_s, concurrence, corps_lot, corps_clients))
+    finally:
+        serveur.should_exit = True
+        fil.join()
+
+    def centile(latences, q):
+        valeur = float(np.percentile(latences, q))
+        return {"median_ms": valeur, "min_ms": min(latences), "repetitions": len(latences), "appels": 1}
+    return {
+        f"service_projection_p50_c{concurrence}": centile(unitaires, 50),
+        f"service_projection_p99_c{concurrence}": centile(unitaires, 99),
+        f"service_lot_{taille_lot}": centile(lots, 50),
+    }
+
+
+def metadonnees():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, cwd=DOSSIER).stdout.strip()
+    except OSError:
+        commit = ""
+    return {
+        "commit": commit,
+        "date": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "processeur": platform.processor(),
+        "graine": GRAINE,
+    }
+
+
+def comparer(nouveau, ancien, seuil=SEUIL_REGRESSION):
+    lignes, regressions = [], 0
+    for nom, mesure in nouveau["resultats"].items():
+        reference = ancien["resultats"].get(nom)
+        if reference is None:
+            lignes.append(f"{nom:<35} {mesure['median_ms']:>12.4f} ms   (nouveau)")
+            continue
+        ecart = mesure["median_ms"] / reference["median_ms"] - 1
+        marque = ""
+        if ecart > seuil:
+            marque, regressions = "  REGRESSION", regressions + 1
+        lignes.append(f"{nom:<35} {reference['median_ms']:>12.4f} -> {mesure['median_ms']:>12.4f} ms  {ecart:+8.1%}{marque}")
+    return "\n".join(lignes), regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks du simulateur EP / ELT / NF")
+    parser.add_argument("--sortie", help="fichier JSON des resultats (defaut : sortie standard)")
+    parser.add_argument("--comparer", help="resultats JSON d'un commit de reference")
+    parser.add_argument("--repetitions", type=int, default=5)
+    parser.add_argument("--tailles", default=",".join(map(str, TAILLES_LOT)), help="tailles de lot, separees par des virgules")
+    parser.add_argument("--sans-rerun", action="store_true", help="ne pas mesurer le rerun complet du script")
+    parser.add_argument("--sans-service", action="store_true", help="ne pas lancer le test de charge du service HTTP")
+    parser.add_argument("--seuil", type=float, default=SEUIL_REGRESSION, help="ecart relatif signale comme regression")
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(GRAINE)
+    resultats = {}
+    resultats.update(bench_calculateur(rng, args.repetitions))
+    resultats.update(bench_calculateur_batch(rng, args.repetitions, [int(t) for t in args.tailles.split(",")]))
+    resultats.update(bench_plot_evolution(args.repetitions))
+    resultats.update(bench_courbes_batch(rng, args.repetitions))
+    resultats.update(bench_pdf(args.repetitions))
+    resultats.update(bench_export(rng, args.repetitions))
+    if not args.sans_rerun:
+        resultats.update(bench_rerun(args.repetitions))
+    if not args.sans_service:
+        resultats.update(bench_service(rng))
+    rapport = {"meta": metadonnees(), "resultats": resultats}
+    if "calculateur_batch_100000" in resultats:
+        acceleration = resultats["calculateur_scalaire_1000"]["median_ms"] * 100 / resultats["calculateur_batch_100000"]["median_ms"]
+        rapport["acceleration_batch_100000"] = {"mesure": round(acceleration, 1), "objectif": OBJECTIF_ACCELERATION}
+        if acceleration < OBJECTIF_ACCELERATION:
+            print(f"calculateur_batch sur 100 000 contrats : x{acceleration:.0f}, sous l'objectif x{OBJECTIF_ACCELERATION}", file=sys.stderr)
+
+    texte = json.dumps(rapport, indent=2)
+    if args.sortie:
+        Path(args.sortie).write_text(texte + "\n", encoding="utf-8")
+    else:
+        print(texte)
+    if args.comparer:
+        ancien = json.loads(Path(args.comparer).read_text(encoding="utf-8"))
+        tableau, regressions = comparer(rapport, ancien, args.seuil)
+        print(f"Comparaison avec {ancien['meta'].get('commit') or args.comparer} :", file=sys.stderr)
+        print(tableau, file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
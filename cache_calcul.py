@@ -0,0 +1,180 @@
+# cache_calcul.py
+# Cache borne (nombre d'entrees + duree de vie) des fonctions de projection.
+# Les caches vivent dans ce module : ils survivent aux reruns du script Streamlit et
+# sont partages entre les sessions du meme serveur. Les resultats mis en cache sont
+# figes (tableaux en lecture seule, dictionnaires non modifiables) pour qu'aucune
+# session ne puisse alterer le resultat d'une autre.
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from types import MappingProxyType
+
+# Politique d'eviction par defaut, reglable par variables d'environnement (TTL 0 = sans expiration)
+MAX_ENTREES = int(os.environ.get("SIMULATEUR_CACHE_MAX_ENTREES", 512))
+TTL = float(os.environ.get("SIMULATEUR_CACHE_TTL", 3600)) or None
+
+_caches = {}
+_verrou_caches = threading.Lock()
+# Compteurs du rerun en cours : chaque rerun Streamlit s'execute dans un seul thread
+_releve = threading.local()
+
+
+class NonCachable(TypeError):
+    pass
+
+
+class CacheBorne:
+    def __init__(self, nom, max_entrees=MAX_ENTREES, ttl=TTL, max_octets=None):
+        self.nom = nom
+        self.max_entrees = max_entrees
+        self.ttl = ttl
+        # Borne facultative sur le total des len(valeur), pour des valeurs en octets
+        self.max_octets = max_octets
+        self.octets = 0
+        self.succes = 0
+        self.echecs = 0
+        self.evictions = 0
+        self.non_cachables = 0
+        self._entrees = OrderedDict()
+        self._verrou = threading.Lock()
+
+    def lire(self, cle):
+        # Renvoie (trouve, valeur) ; les entrees expirees sont retirees au passage
+        with self._verrou:
+            entree = self._entrees.get(cle)
+            if entree is not None:
+                expiration, valeur = entree
+                if expiration is None or expiration > time.monotonic():
+                    self._entrees.move_to_end(cle)
+                    self.succes += 1
+                    return True, valeur
+                self._retirer(cle)
+                self.evictions += 1
+            self.echecs += 1
+            return False, None
+
+    def ecrire(self, cle, valeur):
+        expiration = None if self.ttl is None else time.monotonic() + self.ttl
+        with self._verrou:
+            if self.max_octets is not None and len(valeur) > self.max_octets:
+                return
+            if cle in self._entrees:
+                self._retirer(cle)
+            self._entrees[cle] = (expiration, valeur)
+            if self.max_octets is not None:
+                self.octets += len(valeur)
+            while len(self._entrees) > self.max_entrees or (self.max_octets is not None and self.octets > self.max_octets):
+                self._retirer(next(iter(self._entrees)))
+                self.evictions += 1
+
+    def _retirer(self, cle):
+        _, valeur = self._entrees.pop(cle)
+        if self.max_octets is not None:
+            self.octets -= len(valeur)
+
+    def noter_non_cachable(self):
+        with self._verrou:
+            self.non_cachables += 1
+
+    def vider(self):
+        with self._verrou:
+            self._entrees.clear()
+            self.octets = 0
+
+    def statistiques(self):
+        with self._verrou:
+            appels = self.succes + self.echecs
+            return {
+                "succes": self.succes,
+                "echecs": self.echecs,
+                "taux_succes": self.succes / appels if appels else 0.0,
+                "evictions": self.evictions,
+                "non_cachables": self.non_cachables,
+                "entrees": len(self._entrees),
+                "max_entrees": self.max_entrees,
+                "ttl": self.ttl,
+                **({"octets": self.octets, "max_octets": self.max_octets} if self.max_octets is not None else {}),
+            }
+
+
+def cle_cache(valeur):
+    # Cle hachable et deterministe a partir des arguments d'un appel
+    if isinstance(valeur, (str, bytes, int, float, bool, type(None))):
+        return valeur
+    if isinstance(valeur, (tuple, list)):
+        return (type(valeur).__name__, tuple(cle_cache(v) for v in valeur))
+    if isinstance(valeur, dict):
+        return ("dict", tuple(sorted((k, cle_cache(v)) for k, v in valeur.items())))
+    if hasattr(valeur, "tobytes") and hasattr(valeur, "dtype") and getattr(valeur, "ndim", None) is not None:
+        if valeur.dtype == object:
+            return ("ndarray", valeur.shape, tuple(cle_cache(v) for v in valeur.ravel().tolist()))
+        return ("ndarray", valeur.shape, str(valeur.dtype), valeur.tobytes())
+    try:
+        hash(valeur)
+    except TypeError:
+        raise NonCachable(type(valeur).__name__) from None
+    return valeur
+
+
+def figer(valeur):
+    if hasattr(valeur, "setflags"):
+        valeur.setflags(write=False)
+    elif isinstance(valeur, dict):
+        return MappingProxyType({k: figer(v) for k, v in valeur.items()})
+    elif isinstance(valeur, list):
+        return tuple(figer(v) for v in valeur)
+    return valeur
+
+
+def memoiser(max_entrees=MAX_ENTREES, ttl=TTL):
+    def decorateur(fonction):
+        # Le cache est retrouve a partir du code de la fonction : redefinir la
+        # fonction a chaque rerun reutilise le meme cache, la modifier en cree un neuf
+        identifiant = (fonction.__module__, fonction.__qualname__, fonction.__code__)
+        with _verrou_caches:
+            cache = _caches.get(identifiant)
+            if cache is None:
+                cache = _caches[identifiant] = CacheBorne(fonction.__qualname__, max_entrees, ttl)
+        cache.max_entrees, cache.ttl = max_entrees, ttl
+
+        @wraps(fonction)
+        def enveloppe(*args, **kwargs):
+            try:
+                cle = cle_cache((args, kwargs))
+            except NonCachable:
+                cache.noter_non_cachable()
+                _noter(cache.nom, False)
+                return fonction(*args, **kwargs)
+            trouve, valeur = cache.lire(cle)
+            _noter(cache.nom, trouve)
+            if not trouve:
+                valeur = figer(fonction(*args, **kwargs))
+                cache.ecrire(cle, valeur)
+            return valeur
+
+        enveloppe.cache = cache
+        return enveloppe
+    return decorateur
+
+
+def statistiques_caches():
+    with _verrou_caches:
+        caches = list(_caches.values())
+    return {cache.nom: cache.statistiques() for cache in caches}
+
+
+def _noter(nom, trouve):
+    compteurs = getattr(_releve, "compteurs", None)
+    if compteurs is not None:
+        compteurs.setdefault(nom, {"succes": 0, "calculs": 0})["succes" if trouve else "calculs"] += 1
+
+
+def demarrer_releve():
+    # A appeler en tete de script : les appels suivants du meme thread sont comptes
+    _releve.compteurs = {}
+
+
+def releve():
+    return dict(getattr(_releve, "compteurs", {}))
@@ -0,0 +1,146 @@
+# cache_pdf.py
+# Cache des PDF recapitulatifs adresse par leur contenu : la cle est l'empreinte
+# SHA-256 de toutes les donnees du document et de la mise en page (sources de
+# recap_pdf et graphiques_pdf). Niveau memoire LRU borne en octets, niveau disque
+# facultatif partage entre processus (generation de masse, service HTTP) et entre
+# redemarrages.
+import datetime
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from pathlib import Path
+
+import graphiques_pdf
+import moteur
+import projection
+import recap_pdf
+import reduction_courbes
+from cache_calcul import CacheBorne
+
+MAX_OCTETS = int(os.environ.get("SIMULATEUR_CACHE_PDF_OCTETS", 64 * 1024 * 1024))
+DOSSIER = os.environ.get("SIMULATEUR_CACHE_PDF_DOSSIER") or None
+MAX_OCTETS_DISQUE = int(os.environ.get("SIMULATEUR_CACHE_PDF_OCTETS_DISQUE", 1024 * 1024 * 1024))
+
+# Une modification de la mise en page, des graphiques ou du calcul des courbes invalide
+# aussi les PDF deja ecrits sur disque
+_MODULES = (recap_pdf, graphiques_pdf, moteur, projection, reduction_courbes)
+_MISE_EN_PAGE = hashlib.sha256(b"".join(Path(module.__file__).read_bytes() for module in _MODULES)).hexdigest()
+_cache = None
+_verrou_cache = threading.Lock()
+
+
+def _canonique(valeur):
+    if isinstance(valeur, (datetime.date, datetime.datetime)):
+        return valeur.isoformat()
+    if hasattr(valeur, "tolist"):
+        return valeur.tolist()
+    if isinstance(valeur, (set, frozenset)):
+        return sorted(valeur)
+    raise TypeError(f"valeur non serialisable dans les donnees du PDF : {type(valeur).__name__}")
+
+
+def empreinte_recap(donnees):
+    texte = json.dumps({"mise_en_page": _MISE_EN_PAGE, "donnees": donnees}, sort_keys=True, default=_canonique, separators=(",", ":"))
+    return hashlib.sha256(texte.encode()).hexdigest()
+
+
+class CachePdf:
+    def __init__(self, max_octets=MAX_OCTETS, dossier=DOSSIER, max_octets_disque=MAX_OCTETS_DISQUE):
+        self.memoire = CacheBorne("recap_pdf", max_entrees=1 << 30, ttl=None, max_octets=max_octets)
+        self.dossier = Path(dossier) if dossier else None
+        self.max_octets_disque = max_octets_disque
+        self.succes_disque = 0
+        self.ecritures_disque = 0
+        self.evictions_disque = 0
+        self._octets_disque = None
+        self._verrou = threading.Lock()
+
+    def _chemin(self, cle):
+        return self.dossier / cle[:2] / f"{cle}.pdf"
+
+    def lire(self, cle):
+        # Octets du PDF ou None ; un PDF trouve sur disque remonte en memoire
+        trouve, octets = self.memoire.lire(cle)
+        if trouve or self.dossier is None:
+            return octets
+        chemin = self._chemin(cle)
+        try:
+            octets = chemin.read_bytes()
+            # La date de modification sert d'ordre LRU pour l'eviction sur disque
+            os.utime(chemin)
+        except FileNotFoundError:
+            return None
+        with self._verrou:
+            self.succes_disque += 1
+        self.memoire.ecrire(cle, octets)
+        return octets
+
+    def ecrire(self, cle, octets):
+        self.memoire.ecrire(cle, octets)
+        if self.dossier is None:
+            return
+        chemin = self._chemin(cle)
+        chemin.parent.mkdir(parents=True, exist_ok=True)
+        # Ecriture atomique : un autre processus ne lit jamais un PDF tronque
+        descripteur, temporaire = tempfile.mkstemp(dir=chemin.parent, suffix=".tmp")
+        with os.fdopen(descripteur, "wb") as fichier:
+            fichier.write(octets)
+        os.replace(temporaire, chemin)
+        with self._verrou:
+            self.ecritures_disque += 1
+            if self._octets_disque is None:
+                self._octets_disque = sum(f.stat().st_size for f in self.dossier.glob("*/*.pdf"))
+            else:
+                self._octets_disque += len(octets)
+            if self._octets_disque > self.max_octets_disque:
+                self._borner_disque()
+
+    def _borner_disque(self):
+        # Retire les PDF les moins recemment utilises jusqu'a 90 % de la borne
+        fichiers = sorted((f.stat().st_mtime, f.stat().st_size, f) for f in self.dossier.glob("*/*.pdf"))
+        self._octets_disque = sum(taille for _, taille, _ in fichiers)
+        for _, taille, fichier in fichiers:
+            if self._octets_disque <= 0.9 * self.max_octets_disque:
+                break
+            fichier.unlink(missing_ok=True)
+            self._octets_disque -= taille
+            self.evictions_disque += 1
+
+    def obtenir(self, donnees, rendu=recap_pdf.recap_pdf_octets):
+        cle = empreinte_recap(donnees)
+        octets = self.lire(cle)
+        if octets is None:
+            octets = rendu(donnees)
+            self.ecrire(cle, octets)
+        return octets
+
+    def statistiques(self):
+        memoire = self.memoire.statistiques()
+        with self._verrou:
+            appels = memoire["succes"] + memoire["echecs"]
+            return {
+                "succes_memoire": memoire["succes"],
+                "succes_disque": self.succes_disque,
+                "echecs": memoire["echecs"] - self.succes_disque,
+                "taux_succes": (memoire["succes"] + self.succes_disque) / appels if appels else 0.0,
+                "entrees_memoire": memoire["entrees"],
+                "octets_memoire": memoire["octets"],
+                "evictions_memoire": memoire["evictions"],
+                "ecritures_disque": self.ecritures_disque,
+                "evictions_disque": self.evictions_disque,
+            }
+
+
+def cache_partage():
+    # Cache commun aux sessions et aux travaux de la file des PDF du processus
+    global _cache
+    with _verrou_cache:
+        if _cache is None:
+            _cache = CachePdf()
+        return _cache
+
+
+def recap_pdf_en_cache(donnees):
+    return cache_partage().obtenir(donnees)
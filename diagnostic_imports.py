@@ -0,0 +1,51 @@
+# diagnostic_imports.py
+# Cout d'import des dependances, pour suivre les regressions de temps de demarrage
+import importlib
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+MODULES_APPLICATION = (
+    "streamlit", "pandas", "numpy", "altair", "matplotlib.pyplot", "fpdf",
+    "moteur", "monte_carlo", "backtest", "recap_pdf", "cache_calcul",
+)
+
+_chargements = {}
+_verrou = threading.Lock()
+
+
+def importer_differe(nom):
+    # Import au premier usage d'une fonctionnalite ; la duree du premier chargement est notee
+    module = sys.modules.get(nom)
+    if module is not None:
+        return module
+    debut = time.perf_counter()
+    module = importlib.import_module(nom)
+    with _verrou:
+        _chargements.setdefault(nom, round((time.perf_counter() - debut) * 1000, 1))
+    return module
+
+
+def chargements_differes():
+    with _verrou:
+        return dict(_chargements)
+
+
+def temps_import_a_froid(modules=MODULES_APPLICATION):
+    # Mesure dans un interpreteur neuf avec -X importtime. Pour chaque module, duree
+    # cumulee (ms) de son import, dependances pas encore chargees comprises.
+    code = "\n".join(f"try:\n    import {m}\nexcept ImportError:\n    pass" for m in modules)
+    resultat = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True, text=True, cwd=Path(__file__).parent,
+    )
+    temps = {}
+    for ligne in resultat.stderr.splitlines():
+        if not ligne.startswith("import time:") or "|" not in ligne:
+            continue
+        _, cumule, nom = (champ.strip() for champ in ligne.split("|"))
+        if nom in modules and nom not in temps and cumule.isdigit():
+            temps[nom] = round(int(cumule) / 1000, 1)
+    return temps
@@ -0,0 +1,199 @@
+# export_echeancier.py
+# Echeancier mois par mois d'un ou de nombreux clients (modele de calculateur : plus de
+# versements apres 60 ans, dernier mois egal au capital final), ecrit en CSV, Excel ou
+# Parquet bloc par bloc : la memoire depend de la taille d'un bloc, pas du nombre de
+# clients ni de leur duree.
+#   python export_echeancier.py clients.csv echeanciers.parquet --produit NF
+import argparse
+import importlib.util
+import io
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from diagnostic_imports import importer_differe
+from moteur import AGE_TERME, FISCALITE, MOIS_AVANT_60, calculateur_batch, evolution_detaillee, mensualite_nettoyee_batch
+from projection_batch import colonne, lire_par_blocs
+
+# versement_net : versement apres frais d'entree et taxe sur versement ; rendement et
+# frais (de gestion) sur le capital de debut de mois ; taxe : prelevement ponctuel (60 ans)
+COLONNES_ECHEANCIER = ("client", "mois", "age", "versement", "versement_net", "rendement", "frais", "taxe", "capital")
+FORMATS = {
+    "csv": "text/csv",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "parquet": "application/vnd.apache.parquet",
+}
+LIGNES_PAR_BLOC = 200_000
+# Lignes de donnees par feuille Excel (1 048 576 lignes, en-tete compris)
+LIGNES_PAR_FEUILLE = 1_048_575
+
+
+def formats_disponibles():
+    # Parquet seulement si pyarrow est installe (CSV et Excel s'en passent)
+    return {format: mime for format, mime in FORMATS.items() if format != "parquet" or importlib.util.find_spec("pyarrow")}
+
+
+def echeancier_par_blocs(parametres, age, clients=None, lignes_par_bloc=LIGNES_PAR_BLOC):
+    # parametres : arguments de calculateur (scalaires ou colonnes, un client par ligne).
+    # Produit des DataFrame d'au plus lignes_par_bloc lignes (un client au moins),
+    # clients dans l'ordre, mois croissants.
+    taxe_lib = parametres.get("taxe_lib")
+    colonnes = np.broadcast_arrays(
+        *(np.asarray(parametres[nom], dtype=np.float64) for nom in ("mensuel", "duree", "frais_entree", "frais_gestion", "taux_interet")),
+        np.asarray(0.0 if taxe_lib is None else taxe_lib, dtype=np.float64),
+        np.asarray(parametres.get("taxe_versement", 0.0), dtype=np.float64),
+        np.asarray(parametres.get("montant_initial", 0.0), dtype=np.float64),
+        np.asarray(age, dtype=np.float64),
+        np.asarray(parametres.get("split_60", True), dtype=bool),
+    )
+    mensuel, duree, frais_entree, frais_gestion, taux, taxe_lib, taxe_versement, montant_initial, age, split_60 = (np.ravel(c) for c in colonnes)
+    clients = np.arange(age.size) if clients is None else np.asarray(clients)
+    clients_par_bloc = max(1, lignes_par_bloc // max(int(duree.max(initial=0) * 12), 1))
+    for debut in range(0, age.size, clients_par_bloc):
+        bloc = slice(debut, debut + clients_par_bloc)
+        arguments = (
+            mensuel[bloc], duree[bloc], frais_entree[bloc], frais_gestion[bloc], taux[bloc],
+            taxe_lib[bloc], taxe_versement[bloc], montant_initial[bloc], split_60[bloc],
+        )
+        evolution = evolution_detaillee(*arguments, versements_apres_60=False)
+        capital, mois = evolution["capital"], evolution["mois"]
+        # Mois de l'horizon : capital de calculateur (a 1e-12 pres celui de la forme fermee)
+        n_mois = (duree[bloc] * 12).astype(np.int64)
+        terme = n_mois > 0
+        capital[terme.nonzero()[0], n_mois[terme] - 1] = calculateur_batch(*arguments)[terme]
+        # Capital de debut de mois : montant initial, puis capital (apres taxe) du mois precedent
+        debut_mois = np.concatenate([montant_initial[bloc, None], capital[:, :-1]], axis=1)
+        i, j = np.nonzero(~np.isnan(capital))
+        premier = mois[j] == 1
+        # Plus de versements apres 60 ans pour les contrats au-dela de 37 ans
+        verse = ~(split_60[bloc][i] & (n_mois[i] > MOIS_AVANT_60) & (mois[j] > MOIS_AVANT_60))
+        versement = np.where(verse, mensuel[bloc][i], 0.0) + np.where(premier, montant_initial[bloc][i], 0.0)
+        versement_net = np.where(verse, mensualite_nettoyee_batch(mensuel[bloc], frais_entree[bloc], taxe_versement[bloc])[i], 0.0) + np.where(premier, montant_initial[bloc][i], 0.0)
+        taxe = np.where(mois[j] == MOIS_AVANT_60, evolution["taxe_60"][i], 0.0)
+        yield pd.DataFrame({
+            "client": clients[bloc][i],
+            "mois": mois[j],
+            "age": (age[bloc][i] + (mois[j] - 1) // 12).astype(np.int64),
+            "versement": versement.round(2),
+            "versement_net": versement_net.round(2),
+            "rendement": (debut_mois[i, j] * taux[bloc][i] / 1200).round(2),
+            "frais": (debut_mois[i, j] * frais_gestion[bloc][i] / 1200).round(2),
+            "taxe": taxe.round(2),
+            "capital": capital[i, j].round(2),
+        }, columns=list(COLONNES_ECHEANCIER))
+
+
+def parametres_clients(bloc, produit):
+    # Colonnes d'un bloc de projection_batch -> (arguments de calculateur, age)
+    age = colonne(bloc, "age")
+    if produit == "NF":
+        parametres = dict(
+            mensuel=colonne(bloc, "montant_nf"), duree=colonne(bloc, "duree_nf"), frais_entree=colonne(bloc, "frais_entree_nf"),
+            frais_gestion=colonne(bloc, "frais_gestion_nf"), taux_interet=colonne(bloc, "taux_nf"), montant_initial=colonne(bloc, "montant_initial_nf"),
+        )
+    else:
+        suffixe = produit.lower()
+        parametres = dict(
+            mensuel=colonne(bloc, f"montant_{suffixe}"), duree=AGE_TERME - age, frais_entree=colonne(bloc, f"frais_entree_{suffixe}"),
+            frais_gestion=colonne(bloc, f"frais_gestion_{suffixe}"), taux_interet=colonne(bloc, f"taux_{suffixe}"),
+        )
+    return {**parametres, **FISCALITE[produit]}, age
+
+
+def ecrire_echeancier(blocs, destination, format):
+    # destination : chemin ou fichier binaire (io.BytesIO pour un telechargement).
+    # Chaque bloc est ecrit puis libere ; renvoie le nombre de lignes ecrites.
+    if format not in FORMATS:
+        raise ValueError(f"format inconnu : {format} (attendu : {', '.join(FORMATS)})")
+    fichier = open(destination, "wb") if isinstance(destination, (str, Path)) else destination
+    n_lignes = 0
+    try:
+        if format == "csv" and not importlib.util.find_spec("pyarrow"):
+            # Sans pyarrow : DataFrame.to_csv, bloc par bloc
+            en_tete = True
+            for bloc in blocs:
+                bloc.to_csv(fichier, header=en_tete, index=False, encoding="utf-8")
+                en_tete = False
+                n_lignes += len(bloc)
+            if en_tete:
+                fichier.write((",".join(COLONNES_ECHEANCIER) + "\n").encode())
+        elif format in ("csv", "parquet"):
+            # Ecrivains Arrow en continu : un groupe de lignes Parquet par bloc, CSV
+            # formate en C (dix fois plus rapide que DataFrame.to_csv)
+            pa = importer_differe("pyarrow")
+            ecrivain = None
+            for bloc in blocs:
+                table = pa.Table.from_pandas(bloc, preserve_index=False)
+                if ecrivain is None:
+                    if format == "csv":
+                        ecrivain = importer_differe("pyarrow.csv").CSVWriter(fichier, table.schema)
+                    else:
+                        ecrivain = importer_differe("pyarrow.parquet").ParquetWriter(fichier, table.schema)
+                ecrivain.write_table(table)
+                n_lignes += len(bloc)
+            if ecrivain is not None:
+                ecrivain.close()
+            elif format == "csv":
+                fichier.write((",".join(COLONNES_ECHEANCIER) + "\n").encode())
+        else:
+            # Classeur en ecriture seule : les lignes sont videes sur disque au fil de l'eau
+            classeur = importer_differe("openpyxl").Workbook(write_only=True)
+            feuille, restantes = None, 0
+            for bloc in blocs:
+                # Types Python natifs : openpyxl les ecrit plus vite que les scalaires NumPy
+                for ligne in zip(*(bloc[nom].tolist() for nom in COLONNES_ECHEANCIER)):
+                    if restantes == 0:
+                        feuille = classeur.create_sheet(f"Echeancier {len(classeur.worksheets) + 1}")
+                        feuille.append(COLONNES_ECHEANCIER)
+                        restantes = LIGNES_PAR_FEUILLE
+                    feuille.append(ligne)
+                    restantes -= 1
+                n_lignes += len(bloc)
+            if feuille is None:
+                classeur.create_sheet("Echeancier 1").append(COLONNES_ECHEANCIER)
+            classeur.save(fichier)
+    finally:
+        if fichier is not destination:
+            fichier.close()
+    return n_lignes
+
+
+def echeancier_octets(parametres, age, format):
+    # Fichier complet d'un client, pour un telechargement
+    tampon = io.BytesIO()
+    ecrire_echeancier(echeancier_par_blocs(parametres, age), tampon, format)
+    return tampon.getvalue()
+
+
+def exporter_fichier(entree, sortie, produit, format=None, lignes_par_bloc=LIGNES_PAR_BLOC):
+    # Fichier clients (projection_batch) -> echeanciers de tous les clients, sans
+    # jamais charger plus d'un bloc de clients et d'un bloc de lignes
+    format = format or Path(sortie).suffix.lstrip(".")
+
+    def blocs():
+        for clients in lire_par_blocs(entree, max(1, lignes_par_bloc // 12)):
+            parametres, age = parametres_clients(clients, produit)
+            identifiants = clients["client"].to_numpy() if "client" in clients else clients.index.to_numpy()
+            yield from echeancier_par_blocs(parametres, age, identifiants, lignes_par_bloc)
+    return ecrire_echeancier(blocs(), sortie, format)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Echeanciers mensuels EP / ELT / NF d'un fichier clients")
+    parser.add_argument("entree", help="fichier clients (.csv ou .jsonl, colonnes de projection_batch, client facultatif)")
+    parser.add_argument("sortie", help="fichier a ecrire (.csv, .xlsx ou .parquet)")
+    parser.add_argument("--produit", choices=list(FISCALITE), default="EP")
+    parser.add_argument("--format", choices=list(FORMATS), help="defaut : extension de la sortie")
+    parser.add_argument("--lignes-par-bloc", type=int, default=LIGNES_PAR_BLOC, help="lignes d'echeancier calculees et ecrites a la fois")
+    args = parser.parse_args(argv)
+    debut = time.perf_counter()
+    n_lignes = exporter_fichier(args.entree, args.sortie, args.produit, args.format, args.lignes_par_bloc)
+    duree = time.perf_counter() - debut
+    print(f"{n_lignes} lignes d'echeancier en {duree:.1f} s ({n_lignes / max(duree, 1e-9):,.0f} lignes / s)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
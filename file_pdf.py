@@ -0,0 +1,164 @@
+# file_pdf.py
+# Generation des PDF recapitulatifs en arriere-plan : une session soumet un travail,
+# recoit son identifiant et suit son etat sans bloquer son script. Pool de threads
+# borne, partage par toutes les sessions du serveur (les caches du processus restent
+# communs), avec admission limitee par utilisateur et au total : au-dela, la
+# soumission est refusee plutot que mise en attente.
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from cache_pdf import cache_partage, empreinte_recap
+from recap_pdf import construire_recap, nom_fichier_recap, octets_pdf
+
+TRAVAILLEURS = int(os.environ.get("SIMULATEUR_PDF_TRAVAILLEURS", 2))
+MAX_PAR_UTILISATEUR = int(os.environ.get("SIMULATEUR_PDF_MAX_PAR_UTILISATEUR", 2))
+MAX_GLOBAL = int(os.environ.get("SIMULATEUR_PDF_MAX_GLOBAL", 32))
+# Duree (s) pendant laquelle un PDF termine reste telechargeable
+CONSERVATION = float(os.environ.get("SIMULATEUR_PDF_CONSERVATION", 900))
+
+_file = None
+_verrou_file = threading.Lock()
+
+
+class FileSaturee(RuntimeError):
+    pass
+
+
+class TravailPdf:
+    def __init__(self, utilisateur, donnees):
+        self.id = uuid.uuid4().hex
+        self.utilisateur = utilisateur
+        self.donnees = donnees
+        self.nom_fichier = nom_fichier_recap(donnees)
+        self.cle = empreinte_recap(donnees)
+        # en_attente -> en_cours -> termine | echec | annule
+        self.etat = "en_attente"
+        self.etape = "En attente d'un generateur"
+        self.progression = 0.0
+        self.octets = None
+        self.erreur = None
+        self.soumis = time.monotonic()
+        self.termine = None
+        self.future = None
+        # Annule pendant son rendu : compte dans l'admission jusqu'a la fin, puis retire
+        self.abandonne = False
+
+    @property
+    def actif(self):
+        return self.etat in ("en_attente", "en_cours")
+
+    def _avancer(self, etape, progression):
+        self.etape, self.progression = etape, progression
+
+
+class FilePdf:
+    def __init__(self, travailleurs=TRAVAILLEURS, max_par_utilisateur=MAX_PAR_UTILISATEUR, max_global=MAX_GLOBAL, conservation=CONSERVATION):
+        self.max_par_utilisateur = max_par_utilisateur
+        self.max_global = max_global
+        self.conservation = conservation
+        self.refus = 0
+        self._pool = ThreadPoolExecutor(max_workers=travailleurs, thread_name_prefix="recap_pdf")
+        self._travaux = {}
+        self._verrou = threading.Lock()
+
+    def soumettre(self, utilisateur, donnees):
+        # Renvoie l'identifiant du travail ; FileSaturee si l'utilisateur ou le
+        # serveur a deja trop de PDF en attente ou en cours. Un recapitulatif deja
+        # rendu est servi depuis le cache, sans passer par la file.
+        travail = TravailPdf(utilisateur, donnees)
+        travail.octets = cache_partage().lire(travail.cle)
+        if travail.octets is not None:
+            travail.etat, travail.termine, travail.donnees = "termine", time.monotonic(), None
+            travail._avancer("Termine", 1.0)
+            with self._verrou:
+                self._travaux[travail.id] = travail
+            return travail.id
+        with self._verrou:
+            self._purger()
+            actifs = [t for t in self._travaux.values() if t.actif]
+            if sum(t.utilisateur == utilisateur for t in actifs) >= self.max_par_utilisateur:
+                self.refus += 1
+                raise FileSaturee(f"Deja {self.max_par_utilisateur} PDF en preparation pour vous : patientez jusqu'a la fin de l'un d'eux.")
+            if len(actifs) >= self.max_global:
+                self.refus += 1
+                raise FileSaturee("Trop de PDF en preparation sur le serveur : reessayez dans quelques secondes.")
+            self._travaux[travail.id] = travail
+            travail.future = self._pool.submit(self._executer, travail)
+        return travail.id
+
+    def _executer(self, travail):
+        # Sous le verrou : annuler voit le travail soit en attente, soit en cours
+        with self._verrou:
+            if travail.etat == "annule":
+                return
+            travail.etat = "en_cours"
+        try:
+            travail._avancer("Mise en page", 0.1)
+            pdf = construire_recap(travail.donnees)
+            travail._avancer("Encodage du PDF", 0.7)
+            travail.octets = octets_pdf(pdf)
+            cache_partage().ecrire(travail.cle, travail.octets)
+            travail._avancer("Termine", 1.0)
+            travail.etat = "termine"
+        except Exception as erreur:
+            travail.erreur = f"{type(erreur).__name__}: {erreur}"
+            travail.etat = "echec"
+        finally:
+            travail.termine = time.monotonic()
+            # Donnees inutiles une fois le PDF rendu
+            travail.donnees = None
+            with self._verrou:
+                if travail.abandonne:
+                    self._travaux.pop(travail.id, None)
+
+    def travail(self, identifiant):
+        with self._verrou:
+            return self._travaux.get(identifiant)
+
+    def position(self, identifiant):
+        # Rang dans la file des travaux en attente (1 = prochain a demarrer), 0 sinon
+        with self._verrou:
+            travail = self._travaux.get(identifiant)
+            if travail is None or travail.etat != "en_attente":
+                return 0
+            return 1 + sum(t.etat == "en_attente" and t.soumis < travail.soumis for t in self._travaux.values())
+
+    def annuler(self, identifiant):
+        # Un travail pas encore demarre est retire ; un travail en cours se termine
+        # (il occupe toujours un generateur) mais son resultat est oublie
+        with self._verrou:
+            travail = self._travaux.get(identifiant)
+            if travail is None:
+                return
+            if travail.etat == "en_cours":
+                travail.abandonne = True
+                return
+            del self._travaux[identifiant]
+            if travail.etat == "en_attente":
+                travail.etat = "annule"
+                travail.future.cancel()
+
+    def _purger(self):
+        limite = time.monotonic() - self.conservation
+        for identifiant in [i for i, t in self._travaux.items() if t.termine is not None and t.termine < limite]:
+            del self._travaux[identifiant]
+
+    def statistiques(self):
+        with self._verrou:
+            etats = [t.etat for t in self._travaux.values()]
+            return {etat: etats.count(etat) for etat in ("en_attente", "en_cours", "termine", "echec")} | {"refus": self.refus}
+
+    def fermer(self):
+        self._pool.shutdown(cancel_futures=True)
+
+
+def file_partagee():
+    # File commune aux sessions : vit dans ce module, pas dans le script rejoue
+    global _file
+    with _verrou_file:
+        if _file is None:
+            _file = FilePdf()
+        return _file
@@ -0,0 +1,99 @@
+# generation_pdf_masse.py
+# Generation des PDF recapitulatifs de toute une liste de clients dans une archive ZIP :
+#   python generation_pdf_masse.py clients.csv recapitulatifs.zip --processus 8
+import argparse
+import csv
+import datetime
+import io
+import os
+import sys
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from moteur import AGE_TERME
+from projection_batch import VALEURS_PAR_DEFAUT, lire_par_blocs, projeter_bloc
+from cache_pdf import recap_pdf_en_cache
+from recap_pdf import PRODUITS_PDF, nom_fichier_recap
+
+TAUX_MSCI_DEFAUT = 8.53
+TAILLE_BLOC = 1000
+
+
+def donnees_recap(projections):
+    # Une ligne projetee par projection_batch -> donnees attendues par construire_recap
+    for ligne in projections.to_dict(orient="records"):
+        donnees = {**VALEURS_PAR_DEFAUT, "taux_msci": TAUX_MSCI_DEFAUT}
+        donnees.update((cle, valeur) for cle, valeur in ligne.items() if pd.notna(valeur))
+        produits, date_rdv = donnees.get("produits"), donnees.get("date_rdv")
+        donnees.update(
+            prenom=str(donnees.get("prenom", "")),
+            nom=str(donnees.get("nom", "")),
+            produits=[p.strip() for p in produits.split(";")] if isinstance(produits, str) else PRODUITS_PDF,
+            date_rdv=datetime.date.fromisoformat(date_rdv) if isinstance(date_rdv, str) else datetime.date.today(),
+            age=int(donnees["age"]),
+            duree_nf=int(donnees["duree_nf"]),
+        )
+        donnees["duree"] = AGE_TERME - donnees["age"]
+        yield donnees
+
+
+def rendre_recap(donnees):
+    debut = time.perf_counter()
+    octets = recap_pdf_en_cache(donnees)
+    return nom_fichier_recap(donnees), octets, time.perf_counter() - debut
+
+
+def nom_unique(nom, deja_pris):
+    base, extension = os.path.splitext(nom)
+    candidat, i = nom, 1
+    while candidat in deja_pris:
+        i += 1
+        candidat = f"{base}_{i}{extension}"
+    deja_pris.add(candidat)
+    return candidat
+
+
+def generer_masse(roster, sortie_zip, processus=None, taille_bloc=TAILLE_BLOC, exact=False):
+    # Les PDF sont rendus en parallele bloc par bloc et ecrits dans l'archive au fil
+    # de l'eau ; ils sont deja compresses par fpdf, d'ou ZIP_STORED.
+    processus = processus or os.cpu_count()
+    deja_pris, rapport = set(), []
+    with ProcessPoolExecutor(max_workers=processus) as pool, zipfile.ZipFile(sortie_zip, "w", zipfile.ZIP_STORED) as archive:
+        for bloc in lire_par_blocs(roster, taille_bloc):
+            lignes = list(donnees_recap(projeter_bloc(bloc, exact)))
+            taille_lot = max(1, len(lignes) // (4 * processus))
+            for nom, octets, secondes in pool.map(rendre_recap, lignes, chunksize=taille_lot):
+                nom = nom_unique(nom, deja_pris)
+                archive.writestr(nom, octets)
+                rapport.append((nom, len(octets), round(secondes * 1000, 2)))
+        texte = io.StringIO()
+        csv.writer(texte).writerows([("fichier", "octets", "duree_ms"), *rapport])
+        archive.writestr("rapport_generation.csv", texte.getvalue())
+    return rapport
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="PDF recapitulatifs pour une liste de clients")
+    parser.add_argument("roster", help="fichier clients (.csv ou .jsonl) : prenom, nom, produits (separes par ;), date_rdv, taux_msci et colonnes de projection_batch")
+    parser.add_argument("sortie", help="archive ZIP a ecrire")
+    parser.add_argument("--processus", type=int, default=None, help="nombre de processus (defaut : tous les coeurs)")
+    parser.add_argument("--taille-bloc", type=int, default=TAILLE_BLOC, help="clients lus a la fois")
+    parser.add_argument("--exact", action="store_true", help="capitaux calcules au centime pres")
+    args = parser.parse_args(argv)
+    debut = time.perf_counter()
+    rapport = generer_masse(args.roster, args.sortie, args.processus, args.taille_bloc, args.exact)
+    duree = time.perf_counter() - debut
+    if rapport:
+        durees = sorted(r[2] for r in rapport)
+        print(
+            f"{len(rapport)} PDF en {duree:.1f} s ({len(rapport) / duree:.1f} / s) | "
+            f"rendu median {durees[len(durees) // 2]:.1f} ms, max {durees[-1]:.1f} ms",
+            file=sys.stderr,
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+# graphe_chiffres.py
+# Graphe de dependances des chiffres derives : entrees -> chiffres -> affichages / champs PDF.
+# Un changement d'entree n'invalide que les noeuds qui en dependent ; les autres gardent
+# leur valeur. Les memes definitions servent a l'application (scalaires), au PDF et au
+# traitement par lots (tableaux de clients).
+from functools import partial
+
+from cache_calcul import NonCachable, cle_cache
+from moteur import AGE_TERME, FISCALITE, arrondi_centimes, calculateur_batch
+from projection import projeter
+
+PRODUITS_DEDUCTIBLES = {"ep": "EP", "elt": "ELT"}
+# Chiffres attendus par construire_recap, dans l'ordre des colonnes de projection_batch
+CHIFFRES_PRODUITS = (
+    "cap_ep", "avantage_ep", "total_avantage_ep", "net_mensuel_ep", "net_annuel_ep",
+    "cap_elt", "avantage_elt", "total_avantage_elt", "net_mensuel_elt", "net_annuel_elt",
+    "cap_nf", "total_investi_nf", "profit_nf",
+)
+_ABSENT = object()
+
+
+def _projection(fonction, fiscalite, *args):
+    return fonction(*args, **fiscalite)
+
+
+def _projection_nf(fonction, mensuel, duree, frais_entree, frais_gestion, taux, montant_initial):
+    return fonction(mensuel, duree, frais_entree, frais_gestion, taux, montant_initial=montant_initial, **FISCALITE["NF"])
+
+
+def noeuds_chiffres(capital=calculateur_batch, courbe=projeter):
+    # {nom: (dependances, fonction)} ; capital et courbe (une Projection) sont
+    # remplacables par leurs versions en cache dans l'application
+    noeuds = {"duree": (("age",), lambda age: AGE_TERME - age)}
+    for suffixe, produit in PRODUITS_DEDUCTIBLES.items():
+        projection = (f"montant_{suffixe}", "duree", f"frais_entree_{suffixe}", f"frais_gestion_{suffixe}", f"taux_{suffixe}")
+        noeuds.update({
+            f"avantage_{suffixe}": ((f"montant_{suffixe}", f"deduction_{suffixe}_pct"), lambda montant, deduction: arrondi_centimes(montant * 12 * deduction / 100)),
+            f"total_avantage_{suffixe}": ((f"avantage_{suffixe}", "duree"), lambda avantage, duree: arrondi_centimes(avantage * duree)),
+            f"net_mensuel_{suffixe}": ((f"montant_{suffixe}", f"deduction_{suffixe}_pct"), lambda montant, deduction: arrondi_centimes(montant * (1 - deduction / 100))),
+            f"net_annuel_{suffixe}": ((f"net_mensuel_{suffixe}",), lambda net_mensuel: arrondi_centimes(net_mensuel * 12)),
+            f"cap_{suffixe}": (projection, partial(_projection, capital, FISCALITE[produit])),
+            f"courbe_{suffixe}": (projection, partial(_projection, courbe, FISCALITE[produit])),
+        })
+    projection_nf = ("montant_nf", "duree_nf", "frais_entree_nf", "frais_gestion_nf", "taux_nf", "montant_initial_nf")
+    noeuds.update({
+        "cap_nf": (projection_nf, partial(_projection_nf, capital)),
+        "courbe_nf": (projection_nf, partial(_projection_nf, courbe)),
+        "total_investi_nf": (("montant_nf", "duree_nf", "montant_initial_nf"), lambda montant, duree, montant_initial: montant * 12 * duree + montant_initial),
+        "profit_nf": (("cap_nf", "total_investi_nf"), lambda cap, total_investi: arrondi_centimes(cap - total_investi)),
+    })
+    return noeuds
+
+
+def _identiques(a, b):
+    try:
+        return a is b or (type(a) is type(b) and cle_cache(a) == cle_cache(b))
+    except NonCachable:
+        return False
+
+
+class GrapheCalcul:
+    def __init__(self, noeuds):
+        self.noeuds = noeuds
+        self.executes = []
+        self._valeurs = {}
+        self._dependants = {}
+        for nom, (dependances, _) in noeuds.items():
+            for dependance in dependances:
+                self._dependants.setdefault(dependance, []).append(nom)
+
+    def entrees(self):
+        return sorted(set(self._dependants) - set(self.noeuds))
+
+    def definir(self, **entrees):
+        for nom, valeur in entrees.items():
+            if nom in self.noeuds:
+                raise ValueError(f"{nom} est un chiffre derive, pas une entree")
+            if nom in self._valeurs and _identiques(self._valeurs[nom], valeur):
+                continue
+            self._valeurs[nom] = valeur
+            self._invalider(nom)
+
+    def _invalider(self, nom):
+        # Un noeud calcule a toutes ses dependances calculees : on s'arrete au premier absent
+        for dependant in self._dependants.get(nom, ()):
+            if self._valeurs.pop(dependant, _ABSENT) is not _ABSENT:
+                self._invalider(dependant)
+
+    def valeur(self, nom):
+        if nom in self._valeurs:
+            return self._valeurs[nom]
+        if nom not in self.noeuds:
+            raise KeyError(f"entree non definie : {nom}")
+        dependances, fonction = self.noeuds[nom]
+        valeur = self._valeurs[nom] = fonction(*(self.valeur(d) for d in dependances))
+        self.executes.append(nom)
+        return valeur
+
+    __getitem__ = valeur
+
+    def valeurs(self, noms):
+        return {nom: self.valeur(nom) for nom in noms}
+
+    def demarrer_releve(self):
+        # Les noeuds recalcules depuis cet appel sont listes dans executes
+        self.executes = []
+
@@ -0,0 +1,124 @@
+# graphiques_pdf.py
+# Courbes de capital EP / ELT / NF en images pour le PDF recapitulatif. Rendu hors
+# ecran (Agg, sans pyplot, matplotlib charge au premier graphique) sur une figure
+# creee une fois par thread puis mise a jour ; les PNG restent en memoire (LRU borne
+# en octets), indexes par l'empreinte des parametres de la courbe et reutilises d'un
+# PDF a l'autre. Les courbes suivent calculateur (plus de versements apres 60 ans) et
+# se terminent sur le capital imprime dans le recapitulatif.
+import hashlib
+import io
+import json
+import os
+import threading
+from pathlib import Path
+
+import numpy as np
+
+import moteur
+import projection
+import reduction_courbes
+from cache_calcul import CacheBorne
+from diagnostic_imports import importer_differe
+from moteur import FISCALITE, MOIS_AVANT_60, calculateur_batch, evolution_detaillee
+from projection import projeter_exact
+from reduction_courbes import reduire_courbe
+
+MAX_OCTETS = int(os.environ.get("SIMULATEUR_GRAPHIQUES_OCTETS", 64 * 1024 * 1024))
+POINTS = 240
+# Parametres de la courbe de chaque produit dans les donnees du recapitulatif (age en plus)
+PARAMETRES_GRAPHIQUE = {
+    "EP": ("montant_ep", "duree", "frais_entree_ep", "frais_gestion_ep", "taux_ep"),
+    "ELT": ("montant_elt", "duree", "frais_entree_elt", "frais_gestion_elt", "taux_elt"),
+    "Epargne non fiscale": ("montant_nf", "duree_nf", "frais_entree_nf", "frais_gestion_nf", "taux_nf", "montant_initial_nf"),
+}
+FISCALITE_PRODUIT = {"EP": "EP", "ELT": "ELT", "Epargne non fiscale": "NF"}
+
+# Un changement du rendu ou du calcul des courbes change les cles du cache
+_SOURCES = (Path(__file__), *(Path(module.__file__) for module in (moteur, projection, reduction_courbes)))
+_VERSION = hashlib.sha256(b"".join(source.read_bytes() for source in _SOURCES)).hexdigest()[:16]
+_images = CacheBorne("graphiques_pdf", max_entrees=4096, ttl=None, max_octets=MAX_OCTETS)
+_figures = threading.local()
+_verrou = threading.Lock()
+_rendus = 0
+
+
+def _figure():
+    # Figure, axes et traces du thread courant : seules les donnees changent d'un rendu a l'autre
+    if not hasattr(_figures, "figure"):
+        Figure = importer_differe("matplotlib.figure").Figure
+        FigureCanvasAgg = importer_differe("matplotlib.backends.backend_agg").FigureCanvasAgg
+        ticker = importer_differe("matplotlib.ticker")
+        figure = Figure(figsize=(7, 2.6), dpi=100)
+        canevas = FigureCanvasAgg(figure)
+        axe = figure.add_subplot()
+        figure.subplots_adjust(left=0.12, right=0.98, bottom=0.17, top=0.88)
+        axe.yaxis.set_major_formatter(ticker.FuncFormatter(lambda v, _: f"{v:,.0f} €".replace(",", " ")))
+        axe.set_xlabel("Age", fontsize=8)
+        axe.tick_params(labelsize=8)
+        axe.grid(alpha=0.3)
+        courbe, = axe.plot([], [], color="#1f4e79", linewidth=1.6)
+        repere_60 = axe.axvline(60, color="#c0392b", linestyle="--", linewidth=1)
+        note_60 = axe.annotate("", xy=(0, 0), xytext=(-8, -14), textcoords="offset points", ha="right", fontsize=8, color="#c0392b")
+        _figures.figure = (figure, canevas, axe, courbe, repere_60, note_60)
+    return _figures.figure
+
+
+def courbe_produit(produit, *parametres, exact=False):
+    # Mois, capital et taxe a 60 ans du produit sur le modele de calculateur (calculateur_exact
+    # si exact) : dernier point egal au capital imprime (cap_ep, cap_elt, cap_nf)
+    mensuel, duree, frais_entree, frais_gestion, taux, *montant_initial = parametres
+    arguments = dict(montant_initial=montant_initial[0] if montant_initial else 0.0, **FISCALITE[FISCALITE_PRODUIT[produit]])
+    if exact:
+        projection = projeter_exact(mensuel, duree, frais_entree, frais_gestion, taux, **arguments)
+        return projection.mois, projection.capital, dict(projection.evenements_taxe).get(MOIS_AVANT_60, 0.0)
+    evolution = evolution_detaillee(mensuel, duree, frais_entree, frais_gestion, taux, versements_apres_60=False, **arguments)
+    capital = evolution["capital"][0]
+    # Forme fermee a 1e-12 pres : le point final est celui de calculateur
+    capital[-1] = calculateur_batch(mensuel, duree, frais_entree, frais_gestion, taux, **arguments)
+    return evolution["mois"], capital, float(evolution["taxe_60"][0])
+
+
+def png_courbe(produit, age, *parametres, exact=False):
+    # Courbe du capital avec la chute de la taxe a 60 ans
+    global _rendus
+    mois_complets, capital_complet, taxe_60 = courbe_produit(produit, *parametres, exact=exact)
+    # LTTB garde le premier et le dernier point
+    mois, capital = reduire_courbe(capital_complet, "lttb", POINTS, mois_complets)
+    figure, canevas, axe, courbe, repere_60, note_60 = _figure()
+    courbe.set_data(age + mois / 12, capital)
+    axe.relim()
+    axe.autoscale_view()
+    axe.set_title(f"Evolution estimee du capital - {produit}", fontsize=10)
+    repere_60.set_visible(bool(taxe_60))
+    note_60.set_visible(bool(taxe_60))
+    if taxe_60:
+        repere_60.set_xdata([age + MOIS_AVANT_60 / 12] * 2)
+        note_60.xy = (age + MOIS_AVANT_60 / 12, capital_complet[MOIS_AVANT_60 - 1])
+        note_60.set_text(f"Taxe a 60 ans : {taxe_60:,.0f} €".replace(",", " "))
+    canevas.draw()
+    # PNG sans couche alpha : fpdf 1.7 devrait sinon la decompresser a chaque PDF
+    sortie = io.BytesIO()
+    importer_differe("PIL.Image").fromarray(np.asarray(canevas.buffer_rgba())[..., :3]).save(sortie, "PNG")
+    with _verrou:
+        _rendus += 1
+    return sortie.getvalue()
+
+
+def graphique_produit(produit, donnees):
+    # PNG de la courbe du produit, None si les donnees n'en ont pas les parametres
+    noms = ("age", *PARAMETRES_GRAPHIQUE[produit])
+    if any(nom not in donnees for nom in noms):
+        return None
+    valeurs = [float(donnees[nom]) for nom in noms]
+    exact = bool(donnees.get("calcul_exact"))
+    cle = hashlib.sha256(json.dumps([_VERSION, produit, valeurs, exact]).encode()).hexdigest()
+    trouve, octets = _images.lire(cle)
+    if not trouve:
+        octets = png_courbe(produit, *valeurs, exact=exact)
+        _images.ecrire(cle, octets)
+    return octets
+
+
+def statistiques():
+    with _verrou:
+        return {**_images.statistiques(), "rendus": _rendus}
@@ -0,0 +1,47 @@
+# monte_carlo.py
+# Projection EP / ELT / NF sur des rendements mensuels aleatoires (lognormaux)
+import numpy as np
+
+from moteur import capital_chemins, mensualite_nettoyee_batch
+
+CENTILES = (5, 50, 95)
+TAILLE_LOT = 4096
+
+
+def facteurs_lognormaux(rng, n_mois, n_chemins, taux_moyen, volatilite, frais_gestion):
+    # Rendement brut mensuel lognormal d'esperance taux_moyen / 12 (convention de
+    # calculateur) et de volatilite annuelle volatilite, puis frais de gestion.
+    # Tableau (n_mois, n_chemins) : chaque mois est contigu pour capital_chemins.
+    sigma = volatilite / 100 / np.sqrt(12)
+    mu = np.log1p(taux_moyen / 12 / 100) - sigma ** 2 / 2
+    facteurs = rng.standard_normal((n_mois, n_chemins))
+    facteurs *= sigma
+    facteurs += mu
+    np.exp(facteurs, out=facteurs)
+    facteurs -= frais_gestion / 12 / 100
+    return facteurs
+
+
+def simuler_monte_carlo(mensuel, duree, frais_entree, frais_gestion, taux_moyen, volatilite, n_chemins=10_000, taxe_lib=None, taxe_versement=0.0, montant_initial=0.0, split_60=True, graine=None, centiles=CENTILES, taille_lot=TAILLE_LOT):
+    # Les chemins sont simules par lots de taille_lot : la memoire des tirages
+    # mensuels reste bornee, seul le capital de fin d'annee de chaque chemin est garde.
+    rng = np.random.default_rng(graine)
+    P_net = float(mensualite_nettoyee_batch(mensuel, frais_entree, taxe_versement))
+    n_mois = int(duree) * 12
+    finaux = np.empty(n_chemins)
+    annuels = np.empty((n_chemins, int(duree)), dtype=np.float32)
+    for debut in range(0, n_chemins, taille_lot):
+        taille = min(taille_lot, n_chemins - debut)
+        facteurs = facteurs_lognormaux(rng, n_mois, taille, taux_moyen, volatilite, frais_gestion)
+        finaux[debut:debut + taille], annuels[debut:debut + taille] = capital_chemins(
+            facteurs.T, P_net, montant_initial, taxe_lib, split_60, pas_releve=12
+        )
+    bandes = np.percentile(annuels, centiles, axis=0)
+    bandes = np.column_stack([np.full(len(centiles), float(montant_initial)), bandes])
+    return {
+        "centiles": {c: round(float(v), 2) for c, v in zip(centiles, np.percentile(finaux, centiles))},
+        "moyenne": round(float(finaux.mean()), 2),
+        "annees": np.arange(int(duree) + 1),
+        "bandes": {c: bande for c, bande in zip(centiles, bandes)},
+        "capitaux_finaux": finaux,
+    }
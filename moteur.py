@@ -0,0 +1,493 @@
+# moteur.py
+# Calculs du simulateur EP / ELT / Non-Fiscal : versions scalaires utilisees par
+# l'application et versions vectorisees (NumPy) pour les traitements par lots.
+# Aucun import de streamlit, matplotlib ou fpdf : l'interface, les scripts batch
+# et les processus de travail importent tous ce module.
+from math import pow
+
+
+class _NumpyDiffere:
+    # numpy n'est importe qu'au premier usage d'une fonction vectorisee : les
+    # fonctions scalaires restent disponibles sans payer son temps d'import.
+    # Le premier acces a np.<nom> importe numpy puis remplace ce proxy par le vrai
+    # module dans les globales du module : les appels suivants ne passent plus par
+    # __getattr__. Tout acces a np.<nom> a l'import du module (valeur par defaut
+    # d'argument, constante, annotation evaluee) importerait donc numpy : utiliser
+    # None comme valeur par defaut et resoudre dans le corps de la fonction. Les
+    # autres modules importent numpy eux-memes, jamais np depuis moteur.
+    def __getattr__(self, nom):
+        import numpy
+        globals()["np"] = numpy
+        return getattr(numpy, nom)
+
+
+np = _NumpyDiffere()
+
+MOIS_AVANT_60 = 37 * 12
+TAILLE_BLOC = 8192
+AGE_TERME = 67
+
+# Fiscalite propre a chaque produit (arguments de calculateur)
+FISCALITE = {
+    "EP": dict(taxe_lib=8.0),
+    "ELT": dict(taxe_lib=10.0, taxe_versement=2.0),
+    "NF": dict(taxe_versement=2.0, split_60=False),
+}
+
+
+def future_value_annuity(P, r, n):
+    return P * ((pow(1 + r, n) - 1) / r)
+
+
+def mensualite_nettoyee(P, frais_entree, taxe_versement):
+    return P * (1 - frais_entree / 100) * (1 - taxe_versement / 100)
+
+
+def calculateur(mensuel, duree, frais_entree, frais_gestion, taux_interet, taxe_lib=None, taxe_versement=0.0, montant_initial=0.0, split_60=True):
+    P_net = mensualite_nettoyee(mensuel, frais_entree, taxe_versement)
+    r = (taux_interet - frais_gestion) / 12 / 100
+    n_total = duree * 12
+    if split_60 and duree > 37:
+        n1 = 37 * 12
+        n2 = (duree - 37) * 12
+        cap_60 = montant_initial * pow(1 + r, n1) + future_value_annuity(P_net, r, n1)
+        if taxe_lib:
+            cap_60 *= (1 - taxe_lib / 100)
+        capital_final = cap_60 * pow(1 + r, n2)
+    else:
+        capital_final = montant_initial * pow(1 + r, n_total) + future_value_annuity(P_net, r, n_total)
+    return round(capital_final, 2)
+
+
+def plot_evolution(mensuel, duree, frais_entree, frais_gestion, taux, taxe_lib=None, taxe_versement=0.0, montant_initial=0.0, split_60=True):
+    return courbe_evolution(mensuel, duree, frais_entree, frais_gestion, taux, taxe_lib, taxe_versement, montant_initial, split_60)
+
+
+def _en_tableaux(*valeurs):
+    return np.broadcast_arrays(*(np.asarray(v, dtype=np.float64) for v in valeurs))
+
+
+def _taxe(taxe):
+    # taxe_lib=None dans la version scalaire equivaut a une taxe nulle
+    if taxe is None:
+        return 0.0
+    return np.nan_to_num(np.asarray(taxe, dtype=np.float64))
+
+
+def _centimes(x, marge):
+    # x arrondi au centime (meme resultat que np.round(x, 2)) et indices des valeurs a
+    # moins de marge * |x * 100| d'un demi-centime, dont l'arrondi est incertain
+    centimes = np.multiply(x, 100, out=np.empty_like(x))
+    arrondi = np.rint(centimes, out=np.empty_like(x))
+    # Distance au demi-centime (0 sur un cas limite), calculee en place
+    ecart = np.subtract(centimes, arrondi, out=np.empty_like(centimes))
+    np.abs(ecart, out=ecart)
+    np.subtract(0.5, ecart, out=ecart)
+    np.abs(centimes, out=centimes)
+    centimes *= marge
+    arrondi /= 100
+    with np.errstate(invalid="ignore"):
+        return arrondi, np.flatnonzero(~(ecart > centimes))
+
+
+def _centimes_exacts(x):
+    # round(x, 2) element par element : l'erreur de x * 100 est calculee exactement
+    # (produit de Dekker) et les demi-centimes sont tranches sur la valeur exacte, au pair
+    with np.errstate(invalid="ignore", over="ignore"):
+        centimes = x * 100
+        # x = haut + bas sur 26 bits chacun : haut * 100 et bas * 100 sont exacts
+        coupe = x * 134217729.0  # 2^27 + 1
+        haut = coupe - (coupe - x)
+        erreur = (haut * 100 - centimes) + (x - haut) * 100
+        entier = np.rint(centimes)
+        demi = centimes - entier
+        np.add(entier, 1, out=entier, where=(demi == 0.5) & (erreur > 0))
+        np.subtract(entier, 1, out=entier, where=(demi == -0.5) & (erreur < 0))
+        # Au-dela de 2^52 centimes le centime entier n'est plus exact : round() directement
+        grand = np.flatnonzero(~(np.abs(centimes) < 2.0**52))
+    entier /= 100
+    if grand.size:
+        entier[grand] = [round(v, 2) for v in x[grand].tolist()]
+    return entier
+
+
+def arrondi_centimes(x):
+    # np.round passe par x * 100 et se trompe parfois sur les demi-centimes :
+    # ces cas limites sont tranches comme round() dans la version scalaire
+    x = np.asarray(x, dtype=np.float64)
+    plat = x.reshape(-1)
+    # 1e-15 * |x| couvre quelques ulp d'erreur sur x * 100
+    arrondi, douteux = _centimes(plat, 1e-15)
+    if douteux.size:
+        arrondi[douteux] = _centimes_exacts(plat[douteux])
+    return arrondi.reshape(x.shape)[()]
+
+
+def _facteur_annuite(croissance, r, n):
+    # ((1 + r)^n - 1) / r, avec la limite n quand r = 0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        annuite = np.divide(croissance - 1, r, out=np.empty(np.broadcast_shapes(np.shape(croissance), np.shape(r))))
+    nul = np.broadcast_to(r == 0, annuite.shape)
+    if nul.any():
+        annuite[nul] = np.broadcast_to(n, annuite.shape)[nul]
+    return annuite[()]
+
+
+def future_value_annuity_batch(P, r, n):
+    # Meme formule que future_value_annuity, avec la limite P * n quand r = 0
+    P, r, n = _en_tableaux(P, r, n)
+    return P * _facteur_annuite(np.power(1 + r, n), r, n)
+
+
+def mensualite_nettoyee_batch(P, frais_entree, taxe_versement):
+    P, frais_entree, taxe_versement = _en_tableaux(P, frais_entree, taxe_versement)
+    return P * (1 - frais_entree / 100) * (1 - taxe_versement / 100)
+
+
+def _puissance_scalaire(x, n):
+    # math.pow element par element : np.power en differe d'un ulp sur ~5 % des cas
+    x, n = np.broadcast_arrays(x, n)
+    return np.fromiter(map(pow, x.tolist(), n.tolist()), np.float64, x.size)
+
+
+def _lignes(colonne, indices):
+    # Colonne d'un lot ou argument scalaire, commun a toutes les lignes
+    return colonne[indices] if colonne.ndim else colonne
+
+
+def _calculateur_bloc(mensuel, duree, frais_entree, frais_gestion, taux_interet, taxe_lib, taxe_versement, montant_initial, split_60, puissance=None):
+    # Memes operations, dans le meme ordre, que calculateur : avec puissance=_puissance_scalaire
+    # le capital est identique au bit pres. mensuel est une colonne, les autres
+    # arguments des colonnes ou des scalaires ; les operations se font en place
+    puissance = puissance or np.power
+    P_net = np.divide(frais_entree, 100, out=np.empty(mensuel.shape))
+    np.subtract(1, P_net, out=P_net)
+    np.multiply(mensuel, P_net, out=P_net)
+    P_net *= 1 - taxe_versement / 100
+    r = np.subtract(taux_interet, frais_gestion)
+    r /= 12
+    r /= 100
+    n_total = duree * 12
+    avec_split = np.broadcast_to(split_60 & (duree > 37), P_net.shape)
+    # Avant 60 ans (ou sur toute la duree hors split) : capital initial + annuite
+    n1 = np.array(np.broadcast_to(n_total, P_net.shape))
+    np.copyto(n1, MOIS_AVANT_60, where=avec_split)
+    base = 1 + r
+    croissance = puissance(base, n1)
+    capital = np.multiply(P_net, _facteur_annuite(croissance, r, n1), out=P_net)
+    capital += montant_initial * croissance
+    # Taxe a 60 ans puis capitalisation sans nouveaux versements
+    split = np.flatnonzero(avec_split)
+    if split.size:
+        capital[split] *= 1 - _lignes(taxe_lib, split) / 100
+        capital[split] *= puissance(_lignes(base, split), _lignes(n_total, split) - MOIS_AVANT_60)
+    return capital, croissance
+
+
+def calculateur_batch(mensuel, duree, frais_entree, frais_gestion, taux_interet, taxe_lib=None, taxe_versement=0.0, montant_initial=0.0, split_60=True, arrondi=True, taille_bloc=TAILLE_BLOC):
+    # Equivalent de calculateur() pour des tableaux de contrats : chaque argument
+    # peut etre un scalaire ou un tableau, ils sont diffuses les uns contre les autres.
+    colonnes = [np.asarray(v, dtype=np.float64) for v in (mensuel, duree, frais_entree, frais_gestion, taux_interet, _taxe(taxe_lib), taxe_versement, montant_initial)]
+    colonnes.append(np.asarray(split_60, dtype=bool))
+    forme = np.broadcast_shapes(*(c.shape for c in colonnes))
+    # Les arguments scalaires le restent (NumPy les diffuse dans chaque operation) ;
+    # mensuel est toujours une colonne et donne la taille des resultats
+    colonnes = [np.broadcast_to(c, forme).reshape(-1) if c.ndim or i == 0 else c for i, c in enumerate(colonnes)]
+    capital = np.empty(colonnes[0].size)
+    croissance = np.empty(colonnes[0].size)
+    # Traitement par blocs : les tableaux intermediaires restent en cache
+    for debut in range(0, capital.size, taille_bloc):
+        bloc = slice(debut, debut + taille_bloc)
+        capital[bloc], croissance[bloc] = _calculateur_bloc(*(_lignes(c, bloc) for c in colonnes))
+    if arrondi:
+        # np.power peut differer de math.pow d'un ulp, erreur amplifiee par
+        # (1 + r)^n / ((1 + r)^n - 1) quand r est petit ; avec les arrondis des autres
+        # operations l'ecart reste sous ~9 ulp * (1 + (1 + r)^n / |(1 + r)^n - 1|).
+        # Les capitaux dont le centime en depend (surtout les tres grands capitaux)
+        # sont recalcules avec math.pow, donc au bit pres, puis arrondis comme round()
+        with np.errstate(divide="ignore", invalid="ignore"):
+            marge = np.divide(croissance, croissance - 1, out=croissance)
+        np.abs(marge, out=marge)
+        marge += 1
+        marge *= 2e-15
+        capital, douteux = _centimes(capital, marge)
+        if douteux.size:
+            exact, _ = _calculateur_bloc(*(_lignes(c, douteux) for c in colonnes), puissance=_puissance_scalaire)
+            capital[douteux] = _centimes_exacts(exact)
+    return capital.reshape(forme)
+
+
+def centiemes(x):
+    # Montant en centimes ou pourcentage en points de base (1,90 % -> 190)
+    return np.rint(np.asarray(x, dtype=np.float64) * 100).astype(np.int64)
+
+
+def division_arrondie(numerateur, denominateur):
+    # Division entiere arrondie au plus proche, les moities s'eloignant de zero
+    return np.sign(numerateur) * ((np.abs(numerateur) * 2 + denominateur) // (2 * denominateur))
+
+
+# Au-dela, capital * taux (en points de base) * 2 peut depasser int64
+BORNE_INT64 = 2.0 ** 62
+
+
+def recurrence_centimes(mensuel, duree, frais_entree, frais_gestion, taux_interet, taxe_lib, taxe_versement, montant_initial, split_60, detail=False):
+    # Recurrence mensuelle de calculateur en centimes entiers, un contrat par
+    # element des tableaux 1-D recus. Chaque montant preleve est arrondi au centime :
+    #   versement : frais d'entree, puis taxe sur versement sur le reste ;
+    #   chaque mois : interets bruts et frais de gestion sur le capital du mois precedent ;
+    #   60 ans (mois 444, si duree > 37 ans) : taxe_lib sur le capital, puis plus de versements.
+    # Renvoie capital, versements, frais et taxes cumules en centimes : valeurs finales,
+    # ou avec detail=True un tableau (mois, contrat) par serie.
+    entiers = [centiemes(x) for x in (mensuel, montant_initial, frais_entree, frais_gestion, taux_interet, taxe_lib, taxe_versement)]
+    mensuel_c, montant_initial_c, _, frais_gestion_pb, taux_pb, taxe_lib_pb, _ = entiers
+    n_mois = np.rint(np.asarray(duree, dtype=np.float64) * 12).astype(np.int64)
+    split = split_60 & (n_mois > MOIS_AVANT_60)
+    n_max = int(n_mois.max(initial=0))
+    # NumPy ne signale pas les depassements d'entiers. Borne du capital : tous les
+    # versements capitalises au taux brut sur toute la duree. Les contrats qui peuvent
+    # la depasser sont calcules en entiers Python (tableaux d'objets, lents mais exacts).
+    with np.errstate(over="ignore"):
+        borne = (montant_initial_c + mensuel_c * n_mois) * np.power(1 + np.maximum(taux_pb, 0) / 120_000, n_mois)
+        grand = borne * np.maximum.reduce([taux_pb, frais_gestion_pb, taxe_lib_pb, np.full_like(taux_pb, 10_000)]) >= BORNE_INT64
+    if not grand.any():
+        return _recurrence(*entiers, n_mois, split, n_max, detail)
+    series = None
+    for contrats, dtype in ((~grand, np.int64), (grand, object)):
+        if not contrats.any():
+            continue
+        partie = _recurrence(*(e[contrats].astype(dtype) for e in entiers), n_mois[contrats], split[contrats], n_max, detail)
+        if series is None:
+            series = {nom: np.zeros(valeurs.shape[:-1] + (mensuel_c.size,), dtype=object) for nom, valeurs in partie.items()}
+        for nom, valeurs in partie.items():
+            series[nom][..., contrats] = valeurs
+    return series
+
+
+def _recurrence(mensuel_c, montant_initial_c, frais_entree_pb, frais_gestion_pb, taux_pb, taxe_lib_pb, taxe_versement_pb, n_mois, split, n_max, detail):
+    frais_versement = division_arrondie(mensuel_c * frais_entree_pb, 10_000)
+    taxe_mensuelle = division_arrondie((mensuel_c - frais_versement) * taxe_versement_pb, 10_000)
+    P_net = mensuel_c - frais_versement - taxe_mensuelle
+
+    series = {
+        "capital": montant_initial_c.copy(),
+        "versements": montant_initial_c.copy(),
+        "frais": np.zeros_like(mensuel_c),
+        "taxes": np.zeros_like(mensuel_c),
+    }
+    releves = {nom: [] for nom in series}
+    for mois in range(1, n_max + 1):
+        capital = series["capital"]
+        actif = mois <= n_mois
+        verse = actif & ~(split & (mois > MOIS_AVANT_60))
+        interets = division_arrondie(capital * taux_pb, 120_000)
+        gestion = division_arrondie(capital * frais_gestion_pb, 120_000) * actif
+        capital += (interets * actif - gestion) + P_net * verse
+        series["versements"] += mensuel_c * verse
+        series["frais"] += gestion + frais_versement * verse
+        series["taxes"] += taxe_mensuelle * verse
+        if mois == MOIS_AVANT_60:
+            taxe = division_arrondie(capital * taxe_lib_pb, 10_000) * split
+            capital -= taxe
+            series["taxes"] += taxe
+        if detail:
+            for nom, valeur in series.items():
+                releves[nom].append(valeur.copy())
+    if detail:
+        return {nom: np.array(valeurs, dtype=mensuel_c.dtype).reshape(-1, mensuel_c.size) for nom, valeurs in releves.items()}
+    return series
+
+
+def calculateur_exact(mensuel, duree, frais_entree, frais_gestion, taux_interet, taxe_lib=None, taxe_versement=0.0, montant_initial=0.0, split_60=True, taille_bloc=TAILLE_BLOC):
+    # Mode exact de calculateur_batch : meme interface, recurrence au centime pres
+    # (recurrence_centimes). Les pourcentages sont pris au point de base.
+    *colonnes, split_60 = np.broadcast_arrays(
+        *_en_tableaux(mensuel, duree, frais_entree, frais_gestion, taux_interet, _taxe(taxe_lib), taxe_versement, montant_initial),
+        np.asarray(split_60, dtype=bool),
+    )
+    colonnes = [np.ravel(c) for c in colonnes] + [np.ravel(split_60)]
+    capital = np.empty(split_60.size)
+    for debut in range(0, capital.size, taille_bloc):
+        bloc = slice(debut, debut + taille_bloc)
+        capital[bloc] = recurrence_centimes(*(c[bloc] for c in colonnes))["capital"] / 100
+    return capital.reshape(split_60.shape)
+
+
+# Granularites de projection : nombre de mois entre deux points de courbe
+GRANULARITES = {"mensuelle": 1, "trimestrielle": 3, "annuelle": 12}
+
+
+def evolution_detaillee(mensuel, duree, frais_entree, frais_gestion, taux, taxe_lib=None, taxe_versement=0.0, montant_initial=0.0, split_60=True, pas=1, base_frais=False, versements_apres_60=True):
+    # Forme fermee de plot_evolution, sans boucle, echantillonnee tous les pas mois :
+    # les versements mensuels sont capitalises exactement dans chaque periode, les
+    # points sont donc ceux du modele mensuel aux memes dates. Une ligne par jeu de
+    # parametres (NaN au-dela de sa duree) : capital en fin de mois, taxe_60 (montant
+    # preleve au 444e mois, 0 sans taxe) et, si base_frais, la somme des capitaux de
+    # debut de mois (assiette des frais de gestion, deux fois le cout de la courbe).
+    # versements_apres_60=False suit calculateur : split au-dela de 37 ans seulement,
+    # plus aucun versement apres 60 ans, dernier point egal au capital de calculateur.
+    *colonnes, split_60 = np.broadcast_arrays(
+        *_en_tableaux(mensuel, duree, frais_entree, frais_gestion, taux, _taxe(taxe_lib), taxe_versement, montant_initial),
+        np.asarray(split_60, dtype=bool),
+    )
+    lot = split_60.ndim > 0
+    mensuel, duree, frais_entree, frais_gestion, taux, taxe_lib, taxe_versement, montant_initial, split_60 = (
+        np.ravel(c)[:, None] for c in colonnes + [split_60]
+    )
+    P_net = mensualite_nettoyee_batch(mensuel, frais_entree, taxe_versement)
+    r = (taux - frais_gestion) / 12 / 100
+    log_croissance = np.log1p(r)
+    n_mois = (duree * 12).astype(np.int64)
+    mois = np.arange(pas, n_mois.max(initial=0) + 1, pas)
+
+    def capital(depart, k, versement=P_net):
+        # depart * (1 + r)^k + versements des k derniers mois
+        hausse = np.expm1(k * log_croissance)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            annuite = np.where(r == 0, k, hausse / r)
+        return depart * (hausse + 1) + versement * annuite
+
+    def cumul(depart, k, versement=P_net):
+        # capital(depart, 0) + ... + capital(depart, k - 1)
+        hausse = np.expm1(k * log_croissance)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            annuite = np.where(r == 0, k, hausse / r)
+            versements = np.where(r == 0, k * (k - 1) / 2, (annuite - k) / r)
+        return depart * annuite + versement * versements
+
+    # Taxe appliquee au 444e mois (60 ans) : la courbe repart de ce point taxe
+    if versements_apres_60:
+        taxe = split_60 & (taxe_lib != 0) & (n_mois >= MOIS_AVANT_60)
+        versement_60 = P_net
+    else:
+        taxe = split_60 & (n_mois > MOIS_AVANT_60)
+        versement_60 = 0.0
+    avant_taxe = capital(montant_initial, MOIS_AVANT_60)
+    cap_60 = avant_taxe * (1 - taxe_lib / 100)
+    apres_60 = taxe & (mois >= MOIS_AVANT_60)
+    courbe = np.where(apres_60, capital(cap_60, mois - MOIS_AVANT_60, versement_60), capital(montant_initial, mois))
+    hors_duree = mois > n_mois
+    courbe[hors_duree] = np.nan
+    evolution = {
+        "lot": lot,
+        "mois": mois,
+        "capital": courbe,
+        "taxe_60": np.where(taxe, avant_taxe * taxe_lib / 100, 0.0)[:, 0],
+    }
+    if base_frais:
+        evolution["base_frais"] = np.where(
+            apres_60,
+            cumul(montant_initial, MOIS_AVANT_60) + cumul(cap_60, mois - MOIS_AVANT_60, versement_60),
+            cumul(montant_initial, mois),
+        )
+        evolution["base_frais"][hors_duree] = np.nan
+    return evolution
+
+
+def courbe_evolution(mensuel, duree, frais_entree, frais_gestion, taux, taxe_lib=None, taxe_versement=0.0, montant_initial=0.0, split_60=True, pas=1, versements_apres_60=True):
+    # Capital en fin de chaque periode de pas mois (1 : courbe de plot_evolution).
+    # Avec des tableaux de parametres, renvoie une ligne par jeu de parametres
+    # (completee par des NaN au-dela de sa duree).
+    evolution = evolution_detaillee(mensuel, duree, frais_entree, frais_gestion, taux, taxe_lib, taxe_versement, montant_initial, split_60, pas, versements_apres_60=versements_apres_60)
+    return evolution["capital"] if evolution["lot"] else evolution["capital"][0]
+
+
+def capital_chemins(facteurs, P_net, montant_initial=0.0, taxe_lib=None, split_60=True, pas_releve=0):
+    # Rejoue la logique de calculateur sur des chemins de rendement : facteurs[i, m]
+    # est le facteur de croissance du mois m (net des frais de gestion) du chemin i.
+    # Renvoie le capital final de chaque chemin et, si pas_releve > 0, le capital
+    # releve tous les pas_releve mois (une colonne par releve).
+    n_chemins, n_mois = facteurs.shape
+    split = split_60 and n_mois > MOIS_AVANT_60
+    taxe = float(_taxe(taxe_lib))
+    capital = np.full(n_chemins, float(montant_initial))
+    releves = []
+    for mois in range(n_mois):
+        capital *= facteurs[:, mois]
+        # Avec le split, plus de versements apres 60 ans (comme calculateur)
+        if not split or mois < MOIS_AVANT_60:
+            capital += P_net
+        if split and mois == MOIS_AVANT_60 - 1:
+            capital *= 1 - taxe / 100
+        if pas_releve and (mois + 1) % pas_releve == 0:
+            releves.append(capital.astype(np.float32))
+    if not pas_releve:
+        return capital
+    return capital, np.stack(releves, axis=1) if releves else np.empty((n_chemins, 0), dtype=np.float32)
+
+
+def grille_sensibilite(parametres, taux, frais_gestion, frais_entree=None):
+    # Capital final sur la grille taux x frais de gestion (x frais d'entree) en un
+    # seul appel de calculateur_batch : resultat[i, j(, k)] pour taux[i], frais_gestion[j]
+    # (et frais_entree[k]). parametres donne les autres arguments de calculateur.
+    parametres = {k: v for k, v in parametres.items() if k not in ("taux_interet", "frais_gestion")}
+    axes = [taux, frais_gestion] if frais_entree is None else [taux, frais_gestion, frais_entree]
+    grilles = np.ix_(*(np.asarray(a, dtype=np.float64) for a in axes))
+    if frais_entree is not None:
+        parametres["frais_entree"] = grilles[2]
+    return calculateur_batch(taux_interet=grilles[0], frais_gestion=grilles[1], **parametres)
+
+
+# Versements mensuels maximum des produits fiscaux (plafonds des champs de saisie)
+PLAFONDS_MENSUELS = {"EP": 112.50, "ELT": 210.83}
+
+
+def mensualite_requise(capital_cible, duree, frais_entree, frais_gestion, taux_interet, taxe_lib=None, taxe_versement=0.0, montant_initial=0.0, split_60=True):
+    # calculateur est affine en mensuel (y compris avec la taxe a 60 ans) :
+    # capital = A + B * mensuel, d'ou une solution exacte sans iteration.
+    args = (duree, frais_entree, frais_gestion, taux_interet, taxe_lib, taxe_versement, montant_initial, split_60)
+    A = calculateur_batch(0.0, *args, arrondi=False)
+    B = calculateur_batch(1.0, *args, arrondi=False) - A
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mensuel = (np.asarray(capital_cible, dtype=np.float64) - A) / B
+    # Objectif deja atteint par le seul montant initial : aucun versement requis
+    return np.where(mensuel > 0, mensuel, np.where(B > 0, 0.0, np.nan))
+
+
+def taux_requis(capital_cible, mensuel, duree, frais_entree, frais_gestion, taxe_lib=None, taxe_versement=0.0, montant_initial=0.0, split_60=True, taux_max=50.0, tolerance=1e-6):
+    # Le capital croit avec le taux : bisection vectorisee sur [0, taux_max] %.
+    # 0 quand l'objectif est deja atteint a 0 %, NaN quand il ne l'est pas a taux_max.
+    args = (frais_gestion, taxe_lib, taxe_versement, montant_initial, split_60)
+    cible = np.asarray(capital_cible, dtype=np.float64)
+
+    def capital(taux):
+        return calculateur_batch(mensuel, duree, frais_entree, args[0], taux, *args[1:], arrondi=False)
+
+    capital_nul = capital(0.0)
+    bas = np.zeros(np.broadcast(cible, capital_nul).shape)
+    haut = np.full_like(bas, taux_max)
+    atteint = capital_nul >= cible
+    atteignable = capital(haut) >= cible
+    while np.max(haut - bas, initial=0.0) > tolerance:
+        milieu = (bas + haut) / 2
+        trop_bas = capital(milieu) < cible
+        bas = np.where(trop_bas, milieu, bas)
+        haut = np.where(trop_bas, haut, milieu)
+    return np.where(atteint, 0.0, np.where(atteignable, haut, np.nan))
+
+
+def duree_requise(capital_cible, mensuel, frais_entree, frais_gestion, taux_interet, taxe_lib=None, taxe_versement=0.0, montant_initial=0.0, split_60=True, duree_max=99):
+    # Plus petite duree entiere (en annees) atteignant l'objectif. Avec la taxe a
+    # 60 ans le capital n'est pas monotone en duree : toutes les durees de 1 a
+    # duree_max sont evaluees d'un coup sur un axe supplementaire.
+    durees = np.arange(1, duree_max + 1, dtype=np.float64)
+    args = [np.asarray(a, dtype=np.float64)[..., None] for a in (capital_cible, mensuel, frais_entree, frais_gestion, taux_interet, taxe_versement, montant_initial)]
+    cible, mensuel, frais_entree, frais_gestion, taux_interet, taxe_versement, montant_initial = args
+    taxe_lib = np.asarray(_taxe(taxe_lib))[..., None]
+    split_60 = np.asarray(split_60, dtype=bool)[..., None]
+    capitaux = calculateur_batch(mensuel, durees, frais_entree, frais_gestion, taux_interet, taxe_lib, taxe_versement, montant_initial, split_60, arrondi=False)
+    atteint = capitaux >= cible
+    return np.where(atteint.any(axis=-1), durees[np.argmax(atteint, axis=-1)], np.nan)
+
+
+def indicateurs_fiscaux_batch(montant, deduction_pct, duree):
+    # Avantage fiscal et cout net d'un produit EP / ELT, arrondis comme dans l'application
+    montant, deduction_pct, duree = _en_tableaux(montant, deduction_pct, duree)
+    avantage = arrondi_centimes(montant * 12 * deduction_pct / 100)
+    net_mensuel = arrondi_centimes(montant * (1 - deduction_pct / 100))
+    return {
+        "avantage": avantage,
+        "total_avantage": arrondi_centimes(avantage * duree),
+        "net_mensuel": net_mensuel,
+        "net_annuel": arrondi_centimes(net_mensuel * 12),
+    }
@@ -0,0 +1,160 @@
+# projection.py
+# Resultat compact d'une projection mois par mois : capital, versements, frais et
+# taxes cumules dans un seul tableau contigu (une ligne par serie), plus les
+# evenements de taxe ponctuels. Conversion sans copie vers NumPy, pandas et Arrow.
+import numpy as np
+
+from moteur import MOIS_AVANT_60, calculateur_batch, courbe_evolution, evolution_detaillee, recurrence_centimes
+
+
+class Projection:
+    __slots__ = ("_donnees", "evenements_taxe", "pas")
+    COLONNES = ("capital", "versements_cumules", "frais_cumules", "taxes_cumulees")
+
+    def __init__(self, donnees, evenements_taxe=(), pas=1):
+        donnees = np.ascontiguousarray(donnees)
+        if donnees.ndim != 2 or donnees.shape[0] != len(self.COLONNES):
+            raise ValueError(f"donnees de forme {donnees.shape} : {len(self.COLONNES)} lignes attendues")
+        # Resultat partage (caches, sessions) : lecture seule
+        donnees.setflags(write=False)
+        self._donnees = donnees
+        # ((mois, montant), ...) : taxe prelevee en une fois, par exemple a 60 ans
+        self.evenements_taxe = tuple(evenements_taxe)
+        # Nombre de mois entre deux points (1 mensuel, 3 trimestriel, 12 annuel)
+        self.pas = pas
+
+    def __len__(self):
+        return self._donnees.shape[1]
+
+    def __repr__(self):
+        return f"Projection({len(self)} points tous les {self.pas} mois, capital final {self.capital_final:,.2f}, {self._donnees.dtype})"
+
+    @property
+    def mois(self):
+        # Mois de fin de chaque periode, a partir du premier versement
+        return np.arange(self.pas, (len(self) + 1) * self.pas, self.pas)
+
+    @property
+    def capital(self):
+        return self._donnees[0]
+
+    @property
+    def versements_cumules(self):
+        return self._donnees[1]
+
+    @property
+    def frais_cumules(self):
+        return self._donnees[2]
+
+    @property
+    def taxes_cumulees(self):
+        return self._donnees[3]
+
+    @property
+    def rendements_cumules(self):
+        # Performance brute (avant frais de gestion) accumulee depuis le premier mois
+        return self.capital - self.versements_cumules + self.frais_cumules + self.taxes_cumulees
+
+    @property
+    def capital_final(self):
+        return float(self.capital[-1]) if len(self) else 0.0
+
+    @property
+    def total_investi(self):
+        return float(self.versements_cumules[-1]) if len(self) else 0.0
+
+    @property
+    def profit(self):
+        return self.capital_final - self.total_investi
+
+    @property
+    def nbytes(self):
+        return self._donnees.nbytes
+
+    def to_numpy(self):
+        # Vue (mois, colonne) sur le tableau interne
+        return self._donnees.T
+
+    def to_pandas(self):
+        import pandas as pd
+        return pd.DataFrame(self._donnees.T, index=pd.RangeIndex(self.pas, (len(self) + 1) * self.pas, self.pas, name="mois"), columns=list(self.COLONNES), copy=False)
+
+    def to_arrow(self):
+        import pyarrow as pa
+        return pa.table({nom: pa.array(ligne) for nom, ligne in zip(self.COLONNES, self._donnees)})
+
+
+def projeter(mensuel, duree, frais_entree, frais_gestion, taux, taxe_lib=None, taxe_versement=0.0, montant_initial=0.0, split_60=True, dtype=None, pas=1):
+    # Memes arguments et meme courbe que plot_evolution, avec le detail des flux,
+    # un point tous les pas mois (GRANULARITES) calcule directement en forme fermee
+    evolution = evolution_detaillee(mensuel, duree, frais_entree, frais_gestion, taux, taxe_lib, taxe_versement, montant_initial, split_60, pas, base_frais=True)
+    mois, taxe_60 = evolution["mois"], float(evolution["taxe_60"][0])
+    taxes = mensuel * (1 - frais_entree / 100) * taxe_versement / 100 * mois
+    evenements = ()
+    if taxe_60:
+        taxes = taxes + np.where(mois >= MOIS_AVANT_60, taxe_60, 0.0)
+        evenements = ((MOIS_AVANT_60, taxe_60),)
+    donnees = np.empty((len(Projection.COLONNES), mois.size), dtype=dtype or np.float64)
+    donnees[0] = evolution["capital"][0]
+    donnees[1] = montant_initial + mensuel * mois
+    donnees[2] = mensuel * frais_entree / 100 * mois + evolution["base_frais"][0] * frais_gestion / 1200
+    donnees[3] = taxes
+    return Projection(donnees, evenements, pas)
+
+
+def projeter_exact(mensuel, duree, frais_entree, frais_gestion, taux, taxe_lib=None, taxe_versement=0.0, montant_initial=0.0, split_60=True, dtype=None, pas=1):
+    # Projection au centime pres (recurrence_centimes) : semantique de calculateur,
+    # le dernier point de la courbe est exactement calculateur_exact. La recurrence
+    # reste mensuelle, seuls les points de fin de periode sont gardes.
+    series = recurrence_centimes(*(np.atleast_1d(x) for x in (mensuel, duree, frais_entree, frais_gestion, taux, taxe_lib or 0.0, taxe_versement, montant_initial, split_60)), detail=True)
+    donnees = np.empty((len(Projection.COLONNES), len(series["capital"]) // pas), dtype=dtype or np.float64)
+    for ligne, nom in enumerate(("capital", "versements", "frais", "taxes")):
+        donnees[ligne] = series[nom][pas - 1::pas, 0] / 100
+    evenements = ()
+    if split_60 and taxe_lib and duree * 12 > MOIS_AVANT_60:
+        # Taxes du mois 444 moins la taxe sur versement (identique chaque mois, cf. mois 1)
+        taxes = series["taxes"][:, 0]
+        evenements = ((MOIS_AVANT_60, float(taxes[MOIS_AVANT_60 - 1] - taxes[MOIS_AVANT_60 - 2] - taxes[0]) / 100),)
+    return Projection(donnees, evenements, pas)
+
+
+def projeter_foyer(parametres, pas=1, exact=False):
+    # Tous les produits du foyer sur un calendrier commun, en un seul passage
+    # vectorise : parametres = {produit: arguments de calculateur}. Courbes et
+    # capitaux finaux suivent le meme modele, calculateur (calculateur_exact si
+    # exact) : plus de versements apres 60 ans. Apres son horizon, un produit garde
+    # son capital final dans l'empilement, dont le dernier point est donc le total.
+    produits = list(parametres)
+    colonnes = [
+        np.array([parametres[p][nom] for p in produits], dtype=np.float64)
+        for nom in ("mensuel", "duree", "frais_entree", "frais_gestion", "taux_interet")
+    ]
+    colonnes += [
+        np.array([parametres[p].get(nom) or 0.0 for p in produits], dtype=np.float64)
+        for nom in ("taxe_lib", "taxe_versement", "montant_initial")
+    ]
+    split_60 = np.array([parametres[p].get("split_60", True) for p in produits], dtype=bool)
+    horizons = np.rint(colonnes[1] * 12).astype(np.int64)
+    if exact:
+        # La recurrence en centimes arrete chaque contrat a son horizon : valeur tenue
+        capital = recurrence_centimes(*colonnes, split_60, detail=True)["capital"]
+        # Centimes en entiers Python pour les tres gros capitaux : retour en flottants
+        empilement = (capital[pas - 1::pas].T / 100).astype(np.float64)
+        finaux = (capital[-1] / 100).astype(np.float64) if len(capital) else colonnes[7]
+    else:
+        empilement = np.atleast_2d(courbe_evolution(*colonnes, split_60, pas=pas, versements_apres_60=False))
+        # Point de l'horizon et suivants : capital de calculateur (a 1e-12 pres
+        # celui de la forme fermee), le meme que dans les sections produits
+        finaux = calculateur_batch(*colonnes, split_60)
+        mois = np.arange(pas, empilement.shape[1] * pas + 1, pas)
+        empilement = np.where(mois >= horizons[:, None], finaux[:, None], empilement)
+    total = empilement.sum(axis=0)
+    return {
+        "produits": produits,
+        "mois": np.arange(pas, empilement.shape[1] * pas + 1, pas),
+        "empilement": empilement,
+        "total": total,
+        "horizons": dict(zip(produits, horizons.tolist())),
+        "capitaux_finaux": dict(zip(produits, finaux.tolist())),
+        "capital_total": float(total[-1]) if total.size else float(finaux.sum()),
+    }
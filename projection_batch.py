@@ -0,0 +1,100 @@
+# projection_batch.py
+# Reprojection hors Streamlit d'un fichier clients (CSV ou JSON lines) :
+#   python projection_batch.py clients.csv projections.csv --taille-bloc 100000
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from graphe_chiffres import CHIFFRES_PRODUITS, GrapheCalcul, noeuds_chiffres
+from moteur import PLAFONDS_MENSUELS, calculateur_batch, calculateur_exact
+
+# Valeurs par defaut des champs de l'application, pour les colonnes absentes
+VALEURS_PAR_DEFAUT = {
+    "age": 23,
+    "montant_ep": 87.50, "taux_ep": 5.00, "frais_entree_ep": 3.00, "frais_gestion_ep": 1.90, "deduction_ep_pct": 30.00,
+    "montant_elt": 100.00, "taux_elt": 5.00, "frais_entree_elt": 3.00, "frais_gestion_elt": 1.00, "deduction_elt_pct": 30.00,
+    "montant_nf": 150.00, "duree_nf": 10, "montant_initial_nf": 0.00, "taux_nf": 8.00, "frais_entree_nf": 3.00, "frais_gestion_nf": 1.25,
+}
+# Bornes des champs de l'application (montants a partir de 0 : produit non retenu)
+BORNES = {
+    "age": (18, 60),
+    "montant_ep": (0.0, PLAFONDS_MENSUELS["EP"]), "taux_ep": (0.0, 25.0), "frais_entree_ep": (0.0, 5.0), "frais_gestion_ep": (0.0, 5.0), "deduction_ep_pct": (0.0, 100.0),
+    "montant_elt": (0.0, PLAFONDS_MENSUELS["ELT"]), "taux_elt": (0.0, 25.0), "frais_entree_elt": (0.0, 5.0), "frais_gestion_elt": (0.0, 5.0), "deduction_elt_pct": (0.0, 100.0),
+    "montant_nf": (0.0, 5000.0), "duree_nf": (1, 99), "montant_initial_nf": (0.0, 100_000.0), "taux_nf": (0.0, 25.0), "frais_entree_nf": (0.0, 5.0), "frais_gestion_nf": (0.0, 5.0),
+}
+TAILLE_BLOC = 100_000
+FORMATS_JSON = (".jsonl", ".ndjson", ".json")
+
+
+def lire_par_blocs(chemin, taille_bloc=TAILLE_BLOC):
+    chemin = Path(chemin)
+    if chemin.suffix in FORMATS_JSON:
+        return pd.read_json(chemin, lines=True, chunksize=taille_bloc)
+    return pd.read_csv(chemin, chunksize=taille_bloc)
+
+
+def colonne(bloc, nom):
+    if nom in bloc:
+        return bloc[nom].fillna(VALEURS_PAR_DEFAUT[nom]).to_numpy(dtype=np.float64)
+    return np.full(len(bloc), float(VALEURS_PAR_DEFAUT[nom]))
+
+
+def hors_bornes(colonnes):
+    # Champs dont une valeur (scalaire ou colonne) sort de ses bornes, NaN compris
+    erreurs = []
+    for nom, valeurs in colonnes.items():
+        bas, haut = BORNES[nom]
+        valeurs = np.asarray(valeurs, dtype=np.float64)
+        if not np.all((valeurs >= bas) & (valeurs <= haut)):
+            erreurs.append(f"{nom} hors de [{bas}, {haut}]")
+    return erreurs
+
+
+def projeter_bloc(bloc, exact=False):
+    # Meme graphe que l'application, evalue sur des colonnes entieres
+    graphe = GrapheCalcul(noeuds_chiffres(capital=calculateur_exact if exact else calculateur_batch))
+    graphe.definir(**{nom: colonne(bloc, nom) for nom in graphe.entrees()})
+    return bloc.assign(**graphe.valeurs(CHIFFRES_PRODUITS))
+
+
+def ecrire_bloc(resultats, chemin, premier):
+    mode = "w" if premier else "a"
+    if Path(chemin).suffix in FORMATS_JSON:
+        # json plutot que to_json : ce dernier ecrit 40691539.0900000036 pour 40691539.09.
+        # Cellules vides en null : NaN n'est pas du JSON valide
+        lignes = resultats.astype(object).where(resultats.notna(), None).to_dict(orient="records")
+        with open(chemin, mode, encoding="utf-8") as sortie:
+            sortie.writelines(json.dumps(ligne, ensure_ascii=False, allow_nan=False) + "\n" for ligne in lignes)
+    else:
+        resultats.to_csv(chemin, mode=mode, header=premier, index=False)
+
+
+def projeter_fichier(entree, sortie, taille_bloc=TAILLE_BLOC, exact=False):
+    # Un seul bloc en memoire a la fois : la consommation ne depend pas de la taille du fichier
+    n_lignes = 0
+    for i, bloc in enumerate(lire_par_blocs(entree, taille_bloc)):
+        ecrire_bloc(projeter_bloc(bloc, exact), sortie, premier=i == 0)
+        n_lignes += len(bloc)
+    return n_lignes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Projection EP / ELT / NF d'un fichier clients")
+    parser.add_argument("entree", help="fichier clients (.csv ou .jsonl)")
+    parser.add_argument("sortie", help="fichier de resultats (.csv ou .jsonl)")
+    parser.add_argument("--taille-bloc", type=int, default=TAILLE_BLOC, help="lignes lues et projetees a la fois")
+    parser.add_argument("--exact", action="store_true", help="capitaux calcules au centime pres (recurrence en centimes entiers)")
+    args = parser.parse_args(argv)
+    debut = time.perf_counter()
+    n_lignes = projeter_fichier(args.entree, args.sortie, args.taille_bloc, args.exact)
+    duree = time.perf_counter() - debut
+    print(f"{n_lignes} lignes projetees en {duree:.1f} s ({n_lignes / max(duree, 1e-9) * 60:,.0f} lignes / min)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
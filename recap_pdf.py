@@ -0,0 +1,117 @@
+# recap_pdf.py
+# PDF recapitulatif envoye au client (sections EP / ELT / Epargne non fiscale)
+import os
+import tempfile
+
+from diagnostic_imports import importer_differe
+from graphiques_pdf import graphique_produit
+
+PRODUITS_PDF = ["EP", "ELT", "Epargne non fiscale"]
+
+
+# Fonction de nettoyage pour FPDF
+def safe_text(text):
+    return text.encode("latin-1", "replace").decode("latin-1")
+
+
+def nom_fichier_recap(donnees):
+    return f"recommandations_{donnees['prenom']}_{donnees['nom']}.pdf"
+
+
+def inserer_graphique(pdf, produit, donnees):
+    # Courbe du produit sous sa section, si les parametres de projection sont fournis
+    if not donnees.get("graphiques", True):
+        return
+    octets = graphique_produit(produit, donnees)
+    if octets is None:
+        return
+    # fpdf 1.7 ne lit les images que depuis un fichier : fichier prive a ce rendu,
+    # lu entierement par pdf.image puis supprime
+    with tempfile.NamedTemporaryFile(suffix=".png", delete=False) as fichier:
+        fichier.write(octets)
+    try:
+        pdf.image(fichier.name, w=190)
+    finally:
+        os.unlink(fichier.name)
+    pdf.ln(4)
+
+
+def construire_recap(donnees):
+    # donnees reprend les noms des variables de l'application : prenom, nom, produits,
+    # taux_msci, date_rdv, age, duree, duree_nf, montant_ep, net_mensuel_ep, avantage_ep,
+    # cap_ep, total_avantage_ep, (idem _elt), montant_nf, total_investi_nf, cap_nf,
+    # capital_foyer (facultatif : total des produits retenus) ; avec age, taux_ep,
+    # frais_entree_ep, frais_gestion_ep (idem _elt, _nf) et montant_initial_nf, chaque
+    # section est suivie de sa courbe de capital (sauf graphiques=False), calculee au
+    # centime pres si calcul_exact
+    d = donnees
+    # fpdf n'est charge qu'a la premiere generation de PDF
+    pdf = importer_differe("fpdf").FPDF()
+    pdf.add_page()
+    pdf.set_font("Arial", "", 11)
+
+    pdf.multi_cell(0, 10, safe_text(f"Bonjour {d['prenom']} {d['nom']},\n\nJ'espere que vous allez bien.\n"))
+    pdf.multi_cell(0, 10, safe_text("Suite à notre récent entretien, au cours duquel nous avons réalisé une analyse approfondie de votre situation financière, et après évaluation par un conseiller agréé, je tiens à vous transmettre un récapitulatif des points essentiels abordés ainsi que des recommandations adaptées à vos besoins et à vos objectifs à long terme.\n"))
+    pdf.multi_cell(0, 10, safe_text("Ces propositions s’inscrivent dans une approche personnalisée, en tenant compte des informations que vous nous avez communiquées, afin de vous accompagner au mieux dans l’optimisation et la protection de vos intérêts financiers.\n"))
+
+    if "EP" in d["produits"]:
+        pdf.set_font("Arial", "B", 11)
+        pdf.cell(0, 10, "ÉPARGNES PENSION", ln=True)
+        pdf.set_font("Arial", "", 11)
+        pdf.multi_cell(0, 10, safe_text(f"Montants : {d['montant_ep']:.2f} € BRUTS"))
+        pdf.multi_cell(0, 10, safe_text(f"Coût net mensuel : {d['net_mensuel_ep']:.2f} € / mois"))
+        pdf.multi_cell(0, 10, safe_text(f"Déductibilité : {d['avantage_ep']:.2f} € / an"))
+        pdf.multi_cell(0, 10, safe_text(f"Durée de l'investissement - {d['duree']} ans : âge terme - 67 ans"))
+        pdf.multi_cell(0, 10, safe_text("Frais d'entrée : 3,00 %"))
+        pdf.multi_cell(0, 10, safe_text("Frais de Gestion (annuels) : 1,90 % (EP/ELT Europe Equity AXA); 0,85 % (EP/ELT Multifunds AXA); 1,25 % (EP/ELT iShares P&V)."))
+        pdf.multi_cell(0, 10, safe_text("Rendement attendu : Entre 5,00 % et 10,00 %."))
+        pdf.multi_cell(0, 10, safe_text(f"Dans votre cas, nous partons d'un capital investi de {(d['montant_ep'] * 12 * d['duree']):,.2f} € pour atteindre un montant estimé de {d['cap_ep']:,.2f} € au terme du contrat, taxes et frais compris. L'avantage fiscal perçu représente quant à lui {d['total_avantage_ep']:,.2f} €.\n"))
+        inserer_graphique(pdf, "EP", d)
+
+    if "ELT" in d["produits"]:
+        pdf.set_font("Arial", "B", 11)
+        pdf.cell(0, 10, "ÉPARGNES LONG TERME", ln=True)
+        pdf.set_font("Arial", "", 11)
+        pdf.multi_cell(0, 10, safe_text(f"Montants : {d['montant_elt']:.2f} € BRUTS"))
+        pdf.multi_cell(0, 10, safe_text(f"Coût net mensuel : {d['net_mensuel_elt']:.2f} € / mois"))
+        pdf.multi_cell(0, 10, safe_text(f"Déductibilité : {d['avantage_elt']:.2f} € / an"))
+        pdf.multi_cell(0, 10, safe_text(f"Durée de l'investissement - {d['duree']} ans : âge terme - 67 ans"))
+        pdf.multi_cell(0, 10, safe_text("Frais d'entrée : 3,00 %"))
+        pdf.multi_cell(0, 10, safe_text("Frais de Gestion (annuels) : 1,90 %, 0,85 %, 0,85 %, 0,85 %, 1,00 %, 1,25 % selon fonds sélectionnés."))
+        pdf.multi_cell(0, 10, safe_text("Rendement attendu : Entre 5,00 % et 10,00 %."))
+        pdf.multi_cell(0, 10, safe_text(f"Dans votre cas, nous partons d'un capital investi de {(d['montant_elt'] * 12 * d['duree']):,.2f} € pour atteindre un montant estimé de {d['cap_elt']:,.2f} € au terme du contrat, taxes et frais compris. L'avantage fiscal perçu représente quant à lui {d['total_avantage_elt']:,.2f} €.\n"))
+        inserer_graphique(pdf, "ELT", d)
+
+    if "Epargne non fiscale" in d["produits"]:
+        pdf.set_font("Arial", "B", 11)
+        pdf.cell(0, 10, "ÉPARGNE NON-FISCALE", ln=True)
+        pdf.set_font("Arial", "", 11)
+        pdf.multi_cell(0, 10, safe_text(f"Montants : {d['montant_nf']:.2f} € BRUTS"))
+        pdf.multi_cell(0, 10, safe_text("Frais d'entrée : 3,00 %"))
+        pdf.multi_cell(0, 10, safe_text("Frais de Gestion (annuels) : 1,25 %"))
+        pdf.multi_cell(0, 10, safe_text("Rendement attendu : Entre 8,00 % et 14,00 %."))
+        pdf.multi_cell(0, 10, safe_text(f"Durée de l'investissement - {d['duree_nf']} ans : âge terme - {d['age'] + d['duree_nf']} ans."))
+        pdf.multi_cell(0, 10, safe_text(f"Dans votre cas, nous partons d'un capital investi de {d['total_investi_nf']:,.2f} € pour atteindre un montant estimé de {d['cap_nf']:,.2f} € au terme des {d['duree_nf']} années, taxes et frais compris.\n"))
+        inserer_graphique(pdf, "Epargne non fiscale", d)
+
+    if "capital_foyer" in d and len(d["produits"]) > 1:
+        pdf.set_font("Arial", "B", 11)
+        pdf.cell(0, 10, "SYNTHÈSE DU PATRIMOINE", ln=True)
+        pdf.set_font("Arial", "", 11)
+        pdf.multi_cell(0, 10, safe_text(f"L'ensemble des produits retenus représente un capital estimé de {d['capital_foyer']:,.2f} € à leurs termes respectifs, taxes et frais compris.\n"))
+
+    pdf.multi_cell(0, 10, safe_text(f"Je vous rappelle que ces calculs ont été réalisés sur base d'un rendement fictif de {d['taux_msci']:.2f} %. Sur une période d'environ 30 ans, il convient plutôt d'envisager un rendement final de l'ordre de 5,00 % à 10,00 %, ces 37 dernières années le rendement étant de 8,53 % en moyenne par an (MSCI World Index).\n"))
+    pdf.multi_cell(0, 10, safe_text(f"POUR NOTRE PROCHAIN RENDEZ-VOUS : {d['date_rdv'].strftime('%A %d %B %Y')}"))
+    return pdf
+
+
+def octets_pdf(pdf):
+    # fpdf 1.7 renvoie une chaine latin-1 avec dest="S", fpdf2 un bytearray
+    sortie = pdf.output(dest="S")
+    if isinstance(sortie, str):
+        sortie = sortie.encode("latin-1")
+    return bytes(sortie)
+
+
+def recap_pdf_octets(donnees):
+    return octets_pdf(construire_recap(donnees))
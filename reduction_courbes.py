@@ -0,0 +1,56 @@
+# reduction_courbes.py
+# Reduction du nombre de points des courbes de capital avant envoi au navigateur :
+# agregation annuelle ou sous-echantillonnage LTTB (Largest Triangle Three Buckets)
+# avec un budget de points. Les chutes de la courbe (taxe a 60 ans) sont toujours
+# conservees avec le point qui les precede, pour rester visibles.
+import numpy as np
+
+MODES_COURBE = {"lttb": "Forme preservee (LTTB)", "annuel": "Fin de chaque annee", "mensuel": "Tous les points"}
+BUDGET_POINTS = 120
+
+
+def ruptures(valeurs):
+    # Indices des chutes : dernier point avant la baisse et premier point apres
+    baisses = np.flatnonzero(np.diff(valeurs) < 0)
+    debuts = baisses[np.isin(baisses - 1, baisses, invert=True)]
+    return np.union1d(debuts, debuts + 1)
+
+
+def lttb(x, y, budget):
+    # Garde le premier et le dernier point, puis dans chaque seau le point qui forme
+    # le plus grand triangle avec le point retenu avant et la moyenne du seau suivant
+    n = len(y)
+    if budget >= n or budget < 3:
+        return np.arange(n)
+    indices = np.empty(budget, dtype=np.int64)
+    indices[0], indices[-1] = 0, n - 1
+    bornes = np.append(np.linspace(1, n - 1, budget - 1).astype(np.int64), n)
+    precedent = 0
+    for i in range(budget - 2):
+        debut, fin, fin_suivant = bornes[i], bornes[i + 1], bornes[i + 2]
+        moyenne_x, moyenne_y = x[fin:fin_suivant].mean(), y[fin:fin_suivant].mean()
+        aires = np.abs(
+            (x[precedent] - moyenne_x) * (y[debut:fin] - y[precedent])
+            - (x[precedent] - x[debut:fin]) * (moyenne_y - y[precedent])
+        )
+        precedent = indices[i + 1] = debut + int(np.argmax(aires))
+    return indices
+
+
+def reduire_courbe(courbe, mode="lttb", budget=BUDGET_POINTS, mois=None):
+    # Renvoie (mois, capital) des points a afficher ; sans mois, un point par mois
+    # a partir du premier versement
+    valeurs = np.asarray(courbe, dtype=np.float64)
+    mois = np.arange(1, valeurs.size + 1) if mois is None else np.asarray(mois)
+    connus = ~np.isnan(valeurs)
+    valeurs, mois = valeurs[connus], mois[connus]
+    if mode == "mensuel" or valeurs.size == 0:
+        return mois, valeurs
+    imposes = ruptures(valeurs)
+    if mode == "annuel":
+        garder = np.flatnonzero(mois % 12 == 0)
+        garder = np.union1d(garder, [0, valeurs.size - 1])
+    else:
+        garder = lttb(mois, valeurs, max(budget - imposes.size, 3))
+    garder = np.union1d(garder, imposes)
+    return mois[garder], valeurs[garder]
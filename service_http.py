@@ -0,0 +1,224 @@
+# service_http.py
+# Service HTTP de projection sans etat pour le CRM (ASGI, sans framework) :
+#   python service_http.py --port 8000        (ou : uvicorn service_http:application)
+# GET  /sante
+# POST /projection      un client (champs de projection_batch, exact facultatif) -> chiffres
+# POST /projection/lot  {"clients": [...], "exact": false} -> chiffres colonne par colonne
+# POST /recap           un client de generation_pdf_masse -> PDF recapitulatif
+# Les lots, les PDF et les projections exactes sont calcules dans un pool de
+# processus : la boucle asynchrone ne rend directement que les projections unitaires
+# en flottants (forme fermee, cout independant de la duree). Les champs hors des
+# bornes de l'application sont refuses (400).
+import argparse
+import asyncio
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from generation_pdf_masse import donnees_recap, rendre_recap
+from graphe_chiffres import CHIFFRES_PRODUITS, GrapheCalcul, noeuds_chiffres
+from moteur import calculateur, calculateur_exact
+from projection_batch import VALEURS_PAR_DEFAUT, colonne, hors_bornes, projeter_bloc
+
+PROCESSUS = int(os.environ.get("SERVICE_PROCESSUS", 0)) or os.cpu_count()
+TAILLE_MAX_CORPS = int(os.environ.get("SERVICE_TAILLE_MAX_CORPS", 64 * 1024 * 1024))
+MAX_CLIENTS_LOT = 1_000_000
+
+_pool = None
+
+
+class RequeteInvalide(ValueError):
+    def __init__(self, message, statut=400):
+        super().__init__(message)
+        self.statut = statut
+
+    def __reduce__(self):
+        # Remontee depuis un processus du pool avec son statut
+        return type(self), (str(self), self.statut)
+
+
+def _json(corps):
+    try:
+        donnees = json.loads(corps or b"{}")
+    except (UnicodeDecodeError, json.JSONDecodeError) as erreur:
+        raise RequeteInvalide(f"JSON invalide : {erreur}")
+    if not isinstance(donnees, dict):
+        raise RequeteInvalide("objet JSON attendu")
+    return donnees
+
+
+def _verifier_bornes(colonnes):
+    erreurs = hors_bornes(colonnes)
+    if erreurs:
+        raise RequeteInvalide("; ".join(erreurs))
+
+
+def _verifier_bloc(bloc):
+    # Memes bornes que pour un client seul, colonne par colonne (cellules vides : valeur par defaut)
+    try:
+        colonnes = {nom: colonne(bloc, nom) for nom in VALEURS_PAR_DEFAUT}
+    except (TypeError, ValueError) as erreur:
+        raise RequeteInvalide(f"champ de projection non numerique : {erreur}")
+    _verifier_bornes(colonnes)
+
+
+def projeter_client(client, exact=False):
+    # Meme graphe que l'application, sur les scalaires d'un seul client
+    graphe = GrapheCalcul(noeuds_chiffres(capital=calculateur_exact if exact else calculateur))
+    try:
+        valeurs = {nom: float(client.get(nom, VALEURS_PAR_DEFAUT[nom])) for nom in graphe.entrees()}
+    except (TypeError, ValueError) as erreur:
+        raise RequeteInvalide(f"champ de projection non numerique : {erreur}")
+    _verifier_bornes(valeurs)
+    graphe.definir(**valeurs)
+    return {nom: float(valeur) for nom, valeur in graphe.valeurs(CHIFFRES_PRODUITS).items()}
+
+
+def projeter_lot(corps):
+    # Execute dans un processus du pool : decodage, projection et encodage compris,
+    # pour qu'un gros lot n'occupe jamais la boucle du service
+    donnees = _json(corps)
+    clients = donnees.get("clients")
+    if not isinstance(clients, (list, dict)):
+        raise RequeteInvalide("clients : liste d'objets ou objet de colonnes attendu")
+    try:
+        bloc = pd.DataFrame(clients)
+    except ValueError as erreur:
+        raise RequeteInvalide(f"clients : {erreur}")
+    if len(bloc) > MAX_CLIENTS_LOT:
+        raise RequeteInvalide(f"{len(bloc)} clients : au plus {MAX_CLIENTS_LOT} par lot", 413)
+    _verifier_bloc(bloc)
+    try:
+        resultats = projeter_bloc(bloc, bool(donnees.get("exact")))
+    except (TypeError, ValueError) as erreur:
+        raise RequeteInvalide(f"champ de projection non numerique : {erreur}")
+    chiffres = {nom: resultats[nom].tolist() for nom in CHIFFRES_PRODUITS}
+    return json.dumps({"n": len(bloc), "chiffres": chiffres}).encode()
+
+
+def rendre_pdf(corps):
+    client = _json(corps)
+    if isinstance(client.get("produits"), list):
+        client["produits"] = ";".join(client["produits"])
+    exact = bool(client.pop("exact", False))
+    bloc = pd.DataFrame([client])
+    _verifier_bloc(bloc)
+    try:
+        donnees = next(donnees_recap(projeter_bloc(bloc, exact)))
+    except (TypeError, ValueError) as erreur:
+        raise RequeteInvalide(str(erreur))
+    nom, octets, _ = rendre_recap(donnees)
+    return nom, octets
+
+
+def pool():
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=PROCESSUS)
+    return _pool
+
+
+async def _sante(corps):
+    return 200, "application/json", b'{"statut": "ok"}', ()
+
+
+async def _projection(corps):
+    client = _json(corps)
+    if client.get("exact"):
+        # Recurrence en centimes : cout proportionnel a la duree, hors de la boucle
+        chiffres = await asyncio.get_running_loop().run_in_executor(pool(), projeter_client, client, True)
+    else:
+        chiffres = projeter_client(client)
+    return 200, "application/json", json.dumps(chiffres).encode(), ()
+
+
+async def _projection_lot(corps):
+    octets = await asyncio.get_running_loop().run_in_executor(pool(), projeter_lot, corps)
+    return 200, "application/json", octets, ()
+
+
+async def _recap(corps):
+    nom, octets = await asyncio.get_running_loop().run_in_executor(pool(), rendre_pdf, corps)
+    return 200, "application/pdf", octets, ((b"content-disposition", f'attachment; filename="{nom}"'.encode("latin-1", "replace")),)
+
+
+ROUTES = {
+    ("GET", "/sante"): _sante,
+    ("POST", "/projection"): _projection,
+    ("POST", "/projection/lot"): _projection_lot,
+    ("POST", "/recap"): _recap,
+}
+
+
+async def _lire_corps(receive):
+    morceaux, taille = [], 0
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            raise ConnectionError("client deconnecte")
+        morceau = message.get("body", b"")
+        taille += len(morceau)
+        if taille > TAILLE_MAX_CORPS:
+            raise RequeteInvalide(f"corps de plus de {TAILLE_MAX_CORPS} octets", 413)
+        morceaux.append(morceau)
+        if not message.get("more_body"):
+            return b"".join(morceaux)
+
+
+async def _repondre(send, statut, type_contenu, octets, entetes=()):
+    await send({
+        "type": "http.response.start",
+        "status": statut,
+        "headers": [(b"content-type", type_contenu.encode()), (b"content-length", str(len(octets)).encode()), *entetes],
+    })
+    await send({"type": "http.response.body", "body": octets})
+
+
+async def _cycle_de_vie(receive, send):
+    global _pool
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            if _pool is not None:
+                _pool.shutdown(cancel_futures=True)
+                _pool = None
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def application(scope, receive, send):
+    if scope["type"] == "lifespan":
+        return await _cycle_de_vie(receive, send)
+    if scope["type"] != "http":
+        return
+    route = ROUTES.get((scope["method"], scope["path"]))
+    if route is None:
+        statut = 405 if any(chemin == scope["path"] for _, chemin in ROUTES) else 404
+        return await _repondre(send, statut, "application/json", json.dumps({"erreur": f"{scope['method']} {scope['path']}"}).encode())
+    try:
+        await _repondre(send, *await route(await _lire_corps(receive)))
+    except RequeteInvalide as erreur:
+        await _repondre(send, erreur.statut, "application/json", json.dumps({"erreur": str(erreur)}).encode())
+    except ConnectionError:
+        return
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Service HTTP de projection EP / ELT / NF")
+    parser.add_argument("--hote", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args(argv)
+    try:
+        import uvicorn
+    except ImportError:
+        sys.exit("uvicorn requis pour lancer le service : pip install uvicorn (ou tout autre serveur ASGI)")
+    uvicorn.run(application, host=args.hote, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
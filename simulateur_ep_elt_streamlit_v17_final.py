@@ -1,171 +1,429 @@
 
 # simulateur_ep_elt_streamlit_v12.py
 import streamlit as st
-from math import pow
-import matplotlib.pyplot as plt
-from fpdf import FPDF
-import datetime
+import uuid
+from functools import partial
+import pandas as pd
+import numpy as np
+from moteur import AGE_TERME, FISCALITE, GRANULARITES, PLAFONDS_MENSUELS, calculateur, calculateur_exact, duree_requise, grille_sensibilite, mensualite_requise, taux_requis
+from monte_carlo import simuler_monte_carlo
+from projection import projeter, projeter_exact, projeter_foyer
+from recap_pdf import PRODUITS_PDF
+from backtest import CHEMIN_MSCI, backtest_historique, charger_rendements_msci
+from cache_calcul import demarrer_releve, memoiser, releve, statistiques_caches
+from file_pdf import FileSaturee, file_partagee
+from graphiques_pdf import PARAMETRES_GRAPHIQUE
+from cache_pdf import cache_partage
+from diagnostic_imports import chargements_differes, importer_differe, temps_import_a_froid
+from graphe_chiffres import CHIFFRES_PRODUITS, GrapheCalcul, noeuds_chiffres
+from export_echeancier import FORMATS, echeancier_octets, formats_disponibles
+from projection_batch import VALEURS_PAR_DEFAUT
+from reduction_courbes import BUDGET_POINTS, MODES_COURBE, reduire_courbe
 
 st.set_page_config(page_title="Simulateur EP / ELT / Non-Fiscal", layout="wide")
+demarrer_releve()
+# Identifiant de la session pour l'admission dans la file des PDF
+st.session_state.setdefault("id_session", uuid.uuid4().hex)
 
-def future_value_annuity(P, r, n):
-    return P * ((pow(1 + r, n) - 1) / r)
-
-def mensualite_nettoyee(P, frais_entree, taxe_versement):
-    return P * (1 - frais_entree / 100) * (1 - taxe_versement / 100)
-
-def calculateur(mensuel, duree, frais_entree, frais_gestion, taux_interet, taxe_lib=None, taxe_versement=0.0, montant_initial=0.0, split_60=True):
-    P_net = mensualite_nettoyee(mensuel, frais_entree, taxe_versement)
-    r = (taux_interet - frais_gestion) / 12 / 100
-    n_total = duree * 12
-    if split_60 and duree > 37:
-        n1 = 37 * 12
-        n2 = (duree - 37) * 12
-        cap_60 = montant_initial * pow(1 + r, n1) + future_value_annuity(P_net, r, n1)
-        if taxe_lib:
-            cap_60 *= (1 - taxe_lib / 100)
-        capital_final = cap_60 * pow(1 + r, n2)
+# Versions en cache des projections et des analyses, partagees entre sessions
+calculateur = memoiser()(calculateur)
+projeter = memoiser()(projeter)
+calculateur_exact = memoiser()(calculateur_exact)
+projeter_exact = memoiser()(projeter_exact)
+projeter_foyer = memoiser()(projeter_foyer)
+simuler_monte_carlo = memoiser(max_entrees=32)(simuler_monte_carlo)
+grille_sensibilite = memoiser(max_entrees=64)(grille_sensibilite)
+backtest_historique = memoiser(max_entrees=64)(backtest_historique)
+charger_rendements_msci = memoiser(max_entrees=4, ttl=600)(charger_rendements_msci)
+mensualite_requise = memoiser()(mensualite_requise)
+taux_requis = memoiser()(taux_requis)
+duree_requise = memoiser()(duree_requise)
+temps_import_a_froid = memoiser(max_entrees=1, ttl=600)(temps_import_a_froid)
+
+PRODUITS = ["EP", "ELT", "Epargne non fiscale"]
+# Analyses qui dependent d'un produit : (cle du fragment, cle du selecteur de produit)
+ANALYSES = [("objectif", "produit_obj"), ("monte_carlo", "produit_mc"), ("sensibilite", "produit_sens"), ("backtest", "produit_bt")]
+
+
+def champ(nom):
+    # Valeur d'un champ d'une autre section : un fragment rejoue seul ne recoit pas
+    # forcement l'etat des widgets qu'il n'affiche pas, d'ou la valeur par defaut
+    return st.session_state.get(nom, VALEURS_PAR_DEFAUT[nom])
+
+
+def parametres_produit(produit):
+    # Parametres de projection d'un produit, lus dans l'etat de session pour que
+    # chaque section puisse se rejouer seule avec les valeurs courantes
+    if produit == "Epargne non fiscale":
+        return dict(mensuel=champ("montant_nf"), duree=champ("duree_nf"), frais_entree=champ("frais_entree_nf"), frais_gestion=champ("frais_gestion_nf"), taux_interet=champ("taux_nf"), montant_initial=champ("montant_initial_nf"), **FISCALITE["NF"])
+    suffixe = produit.lower()
+    return dict(mensuel=champ(f"montant_{suffixe}"), duree=AGE_TERME - champ("age"), frais_entree=champ(f"frais_entree_{suffixe}"), frais_gestion=champ(f"frais_gestion_{suffixe}"), taux_interet=champ(f"taux_{suffixe}"), **FISCALITE[produit])
+
+
+def serie_affichee(projection, mode, budget):
+    # Courbe reduite avant envoi au navigateur : moins de points, chute a 60 ans conservee
+    mois, capital = reduire_courbe(projection.capital, mode, budget, projection.mois)
+    return pd.Series(capital, index=pd.Index(mois, name="Mois"), name="Capital")
+
+
+def foyer_session():
+    # EP, ELT et NF sur un calendrier commun, en un seul passage (en cache)
+    ss = st.session_state
+    pas = GRANULARITES[ss.get("granularite", "mensuelle")]
+    return projeter_foyer({produit: parametres_produit(produit) for produit in PRODUITS}, pas, bool(ss.get("calcul_exact")))
+
+
+def empilement_affiche(foyer, mode, budget):
+    # Points gardes par la reduction de chaque produit et du total, pour que les
+    # chutes (taxe a 60 ans) restent visibles dans le graphique empile
+    mois = foyer["mois"]
+    gardes = [reduire_courbe(courbe, mode, budget, mois)[0] for courbe in (*foyer["empilement"], foyer["total"])]
+    garder = np.isin(mois, np.unique(np.concatenate(gardes)))
+    return pd.DataFrame(foyer["empilement"][:, garder].T, index=pd.Index(mois[garder], name="Mois"), columns=foyer["produits"])
+
+
+def graphe_session():
+    # Graphe des chiffres derives propre a la session (un par mode de calcul et granularite),
+    # resynchronise avec les champs deja affiches : seuls les chiffres dont une
+    # entree a change sont recalcules
+    ss = st.session_state
+    granularite = ss.get("granularite", "mensuelle")
+    cle = f"graphe_{'exact' if ss.get('calcul_exact') else 'flottant'}_{granularite}"
+    if cle not in ss:
+        pas = GRANULARITES[granularite]
+        if ss.get("calcul_exact"):
+            noeuds = noeuds_chiffres(capital=calculateur_exact, courbe=partial(projeter_exact, pas=pas))
+        else:
+            noeuds = noeuds_chiffres(capital=calculateur, courbe=partial(projeter, pas=pas))
+        for suffixe in ("ep", "elt", "nf"):
+            noeuds[f"affichage_{suffixe}"] = ((f"courbe_{suffixe}", "mode_courbes", "points_courbes"), serie_affichee)
+        ss[cle] = GrapheCalcul(noeuds)
+    graphe = ss[cle]
+    graphe.definir(**{nom: ss[nom] for nom in graphe.entrees() if nom in ss})
+    return graphe
+
+
+def relancer_sections(section, produit):
+    # Un champ produit ne rejoue que sa section, les analyses affichees pour ce
+    # produit, le patrimoine du foyer, le PDF deja soumis (devenu obsolete) et les diagnostics
+    ss = st.session_state
+    sections = [section, "foyer"] + [cle for cle, selecteur in ANALYSES if ss.get(selecteur) == produit]
+    if ss.get("travail_pdf"):
+        oublier_pdf()
+        sections.append("pdf")
+    demarrer_releve()
+    graphe_session().demarrer_releve()
+    st.rerun(sections + ["diagnostics"])
+
+
+@st.fragment(key="ep")
+def section_ep():
+    rejouer = dict(on_change=relancer_sections, args=("ep", "EP"))
+    st.number_input("Montant EP mensuel (€)", 30.00, PLAFONDS_MENSUELS["EP"], 87.50, step=0.01, key="montant_ep", **rejouer)
+    st.number_input("Taux EP (%)", 0.00, 25.00, 5.00, step=0.01, key="taux_ep", **rejouer)
+    st.number_input("Frais entree EP (%)", 0.00, 5.00, 3.00, step=0.01, key="frais_entree_ep", **rejouer)
+    st.number_input("Frais gestion EP (%)", 0.00, 5.00, 1.90, step=0.01, key="frais_gestion_ep", **rejouer)
+    st.number_input("Deduction EP (%)", 0.00, 100.00, 30.00, step=0.01, key="deduction_ep_pct", **rejouer)
+    chiffres = graphe_session()
+    st.success(f"Capital estime a 67 ans : {chiffres['cap_ep']:,.2f} €")
+    st.info(f"Net mensuel : {chiffres['net_mensuel_ep']:.2f} € | Net annuel : {chiffres['net_annuel_ep']:.2f} €")
+    st.warning(f"Avantage fiscal annuel : {chiffres['avantage_ep']:.2f} € | Total : {chiffres['total_avantage_ep']:.2f} €")
+    st.line_chart(chiffres["affichage_ep"])
+
+
+@st.fragment(key="elt")
+def section_elt():
+    rejouer = dict(on_change=relancer_sections, args=("elt", "ELT"))
+    st.number_input("Montant ELT mensuel (€)", 30.00, PLAFONDS_MENSUELS["ELT"], 100.00, step=0.01, key="montant_elt", **rejouer)
+    st.number_input("Taux ELT (%)", 0.00, 25.00, 5.00, step=0.01, key="taux_elt", **rejouer)
+    st.number_input("Frais entree ELT (%)", 0.00, 5.00, 3.00, step=0.01, key="frais_entree_elt", **rejouer)
+    st.number_input("Frais gestion ELT (%)", 0.00, 5.00, 1.00, step=0.01, key="frais_gestion_elt", **rejouer)
+    st.number_input("Deduction ELT (%)", 0.00, 100.00, 30.00, step=0.01, key="deduction_elt_pct", **rejouer)
+    chiffres = graphe_session()
+    st.success(f"Capital estime a 67 ans : {chiffres['cap_elt']:,.2f} €")
+    st.info(f"Net mensuel : {chiffres['net_mensuel_elt']:.2f} € | Net annuel : {chiffres['net_annuel_elt']:.2f} €")
+    st.warning(f"Avantage fiscal annuel : {chiffres['avantage_elt']:.2f} € | Total : {chiffres['total_avantage_elt']:.2f} €")
+    st.line_chart(chiffres["affichage_elt"])
+
+
+@st.fragment(key="nf")
+def section_nf():
+    rejouer = dict(on_change=relancer_sections, args=("nf", "Epargne non fiscale"))
+    col3, col4 = st.columns(2)
+    with col3:
+        st.number_input("Montant NF mensuel (€)", 10.00, 5000.00, 150.00, step=1.00, key="montant_nf", **rejouer)
+        st.slider("Duree investissement (ans)", 1, 99, 10, key="duree_nf", **rejouer)
+    with col4:
+        st.number_input("Montant initial (€)", 0.00, 100000.00, 0.00, step=100.00, key="montant_initial_nf", **rejouer)
+        st.number_input("Taux NF (%)", 0.00, 25.00, 8.00, step=0.01, key="taux_nf", **rejouer)
+        st.number_input("Frais entree NF (%)", 0.00, 5.00, 3.00, step=0.01, key="frais_entree_nf", **rejouer)
+        st.number_input("Frais gestion NF (%)", 0.00, 5.00, 1.25, step=0.01, key="frais_gestion_nf", **rejouer)
+    chiffres = graphe_session()
+    st.success(f"Capital final apres {st.session_state['duree_nf']} ans : {chiffres['cap_nf']:,.2f} €")
+    st.info(f"Total investi : {chiffres['total_investi_nf']:,.2f} €")
+    st.warning(f"Profit net estime : {chiffres['profit_nf']:,.2f} €")
+    st.line_chart(chiffres["affichage_nf"])
+
+
+@st.fragment(key="foyer")
+def section_foyer():
+    ss = st.session_state
+    foyer = foyer_session()
+    finaux = foyer["capitaux_finaux"]
+    st.success(f"Patrimoine total estime : {foyer['capital_total']:,.2f} € (EP {finaux['EP']:,.2f} € + ELT {finaux['ELT']:,.2f} € + NF {finaux['Epargne non fiscale']:,.2f} €)")
+    st.area_chart(empilement_affiche(foyer, ss.get("mode_courbes", next(iter(MODES_COURBE))), ss.get("points_courbes", BUDGET_POINTS)), stack=True)
+    with st.expander("Exporter l'echeancier mensuel"):
+        col_produit, col_format = st.columns(2)
+        produit = col_produit.selectbox("Produit", PRODUITS, key="produit_export")
+        format = col_format.selectbox("Format", list(formats_disponibles()), key="format_export")
+        # Fichier genere seulement au clic, hors du script, avec les parametres affiches
+        donnees = partial(echeancier_octets, parametres_produit(produit), champ("age"), format)
+        nom_fichier = f"echeancier_{produit.lower().replace(' ', '_')}.{format}"
+        st.download_button("📥 Télécharger l'échéancier", donnees, file_name=nom_fichier, mime=FORMATS[format])
+
+
+@st.fragment(key="objectif")
+def section_objectif():
+    col9, col10 = st.columns(2)
+    with col9:
+        produit_obj = st.selectbox("Produit concerne", PRODUITS, key="produit_obj")
+        capital_cible = st.number_input("Capital vise (€)", 1000.00, 10000000.00, 100000.00, step=1000.00)
+        inconnue_obj = st.radio("Valeur a calculer", ["Montant mensuel", "Taux", "Duree"], horizontal=True)
+    params_obj = dict(parametres_produit(produit_obj))
+    mensuel_obj = params_obj.pop("mensuel")
+    with col10:
+        if inconnue_obj == "Montant mensuel":
+            mensuel_requis = float(mensualite_requise(capital_cible, **params_obj))
+            st.success(f"Montant mensuel requis : {mensuel_requis:,.2f} €")
+            plafond_obj = PLAFONDS_MENSUELS.get(produit_obj)
+            if plafond_obj is not None and mensuel_requis > plafond_obj:
+                params_plafond = dict(params_obj)
+                params_plafond.pop("taux_interet")
+                taux_plafond = float(taux_requis(capital_cible, plafond_obj, **params_plafond))
+                if np.isnan(taux_plafond):
+                    st.warning(f"Au-dela du plafond {produit_obj} de {plafond_obj:.2f} € / mois : objectif hors d'atteinte meme avec le versement maximum et un taux de 50 %")
+                else:
+                    st.warning(f"Au-dela du plafond {produit_obj} de {plafond_obj:.2f} € / mois : il faudrait un taux de {taux_plafond:.2f} % avec le versement maximum")
+        elif inconnue_obj == "Taux":
+            params_obj.pop("taux_interet")
+            taux_obj = float(taux_requis(capital_cible, mensuel_obj, **params_obj))
+            if np.isnan(taux_obj):
+                st.warning("Objectif hors d'atteinte avec un taux compris entre 0 et 50 %")
+            else:
+                st.success(f"Taux requis : {taux_obj:.2f} % avec {mensuel_obj:.2f} € / mois")
+        else:
+            params_obj.pop("duree")
+            duree_obj = float(duree_requise(capital_cible, mensuel_obj, **params_obj))
+            if np.isnan(duree_obj):
+                st.warning("Objectif hors d'atteinte en moins de 99 ans")
+            else:
+                st.success(f"Duree requise : {duree_obj:.0f} ans avec {mensuel_obj:.2f} € / mois")
+
+
+@st.fragment(key="monte_carlo")
+def section_monte_carlo():
+    col5, col6 = st.columns(2)
+    with col5:
+        produit_mc = st.selectbox("Produit a simuler", PRODUITS, key="produit_mc")
+        volatilite_mc = st.number_input("Volatilite annuelle (%)", 0.00, 50.00, 15.00, step=0.50)
+        n_chemins_mc = st.number_input("Nombre de trajectoires", 1000, 100000, 10000, step=1000)
+        lancer_mc = st.toggle("Lancer la simulation")
+    if lancer_mc:
+        params_mc = dict(parametres_produit(produit_mc))
+        taux_mc = params_mc.pop("taux_interet")
+        resultat_mc = simuler_monte_carlo(taux_moyen=taux_mc, volatilite=volatilite_mc, n_chemins=int(n_chemins_mc), graine=0, **params_mc)
+        with col6:
+            st.success(f"Capital median (P50) : {resultat_mc['centiles'][50]:,.2f} €")
+            st.info(f"Scenario defavorable (P5) : {resultat_mc['centiles'][5]:,.2f} €")
+            st.warning(f"Scenario favorable (P95) : {resultat_mc['centiles'][95]:,.2f} €")
+        st.line_chart({f"P{c}": bande for c, bande in resultat_mc["bandes"].items()})
+
+
+@st.fragment(key="sensibilite")
+def section_sensibilite():
+    col7, col8 = st.columns(2)
+    with col7:
+        produit_sens = st.selectbox("Produit a analyser", PRODUITS, key="produit_sens")
+        taux_min_sens, taux_max_sens = st.slider("Plage de taux (%)", 0.00, 25.00, (0.00, 15.00), step=0.25)
+        frais_max_sens = st.slider("Frais de gestion maximum (%)", 0.25, 5.00, 3.00, step=0.25)
+    with col8:
+        points_sens = st.slider("Points par axe", 10, 100, 50)
+        inclure_frais_entree = st.toggle("Faire varier les frais d'entree")
+        afficher_sens = st.toggle("Afficher la carte de sensibilite")
+    if not afficher_sens:
+        return
+    alt = importer_differe("altair")
+    params_sens = parametres_produit(produit_sens)
+    axe_taux = np.linspace(taux_min_sens, taux_max_sens, points_sens)
+    axe_frais = np.linspace(0.0, frais_max_sens, points_sens)
+    axe_entree = np.linspace(0.0, 5.0, 21) if inclure_frais_entree else None
+    grille = grille_sensibilite(params_sens, axe_taux, axe_frais, axe_entree)
+    frais_entree_sens = params_sens["frais_entree"]
+    if inclure_frais_entree:
+        frais_entree_sens = st.select_slider("Frais d'entree affiches (%)", axe_entree, value=axe_entree[np.abs(axe_entree - frais_entree_sens).argmin()])
+        grille = grille[:, :, int(np.flatnonzero(axe_entree == frais_entree_sens)[0])]
+    pas_taux = (axe_taux[1] - axe_taux[0]) / 2 if points_sens > 1 else 0.5
+    pas_frais = (axe_frais[1] - axe_frais[0]) / 2 if points_sens > 1 else 0.5
+    cellules = pd.DataFrame({
+        "Taux (%)": np.repeat(axe_taux, points_sens),
+        "Frais de gestion (%)": np.tile(axe_frais, points_sens),
+        "Capital final (€)": grille.ravel(),
+    })
+    cellules["taux_debut"] = cellules["Taux (%)"] - pas_taux
+    cellules["taux_fin"] = cellules["Taux (%)"] + pas_taux
+    cellules["frais_debut"] = cellules["Frais de gestion (%)"] - pas_frais
+    cellules["frais_fin"] = cellules["Frais de gestion (%)"] + pas_frais
+    point_actuel = pd.DataFrame({"Taux (%)": [params_sens["taux_interet"]], "Frais de gestion (%)": [params_sens["frais_gestion"]]})
+    carte = alt.Chart(cellules).mark_rect().encode(
+        x=alt.X("taux_debut:Q", title="Taux (%)"),
+        x2="taux_fin:Q",
+        y=alt.Y("frais_debut:Q", title="Frais de gestion (%)"),
+        y2="frais_fin:Q",
+        color=alt.Color("Capital final (€):Q", scale=alt.Scale(scheme="viridis")),
+        tooltip=["Taux (%)", "Frais de gestion (%)", "Capital final (€)"],
+    )
+    repere = alt.Chart(point_actuel).mark_point(color="red", size=200, filled=True).encode(x="Taux (%):Q", y="Frais de gestion (%):Q")
+    st.altair_chart(carte + repere)
+    st.caption(f"Point rouge : parametres actuels ({params_sens['taux_interet']:.2f} % / {params_sens['frais_gestion']:.2f} % / entree {frais_entree_sens:.2f} %)")
+
+
+@st.fragment(key="backtest")
+def section_backtest():
+    if not CHEMIN_MSCI.exists():
+        st.info(f"Serie MSCI World introuvable : deposer les rendements mensuels dans {CHEMIN_MSCI}")
+        return
+    serie_msci = charger_rendements_msci()
+    produit_bt = st.selectbox("Produit a rejouer", PRODUITS, key="produit_bt")
+    params_bt = dict(parametres_produit(produit_bt))
+    params_bt.pop("taux_interet")
+    try:
+        resultat_bt = backtest_historique(serie_msci["rendement"].to_numpy(), dates=serie_msci["date"].dt.date.to_numpy(), **params_bt)
+    except ValueError as erreur:
+        st.warning(str(erreur))
     else:
-        capital_final = montant_initial * pow(1 + r, n_total) + future_value_annuity(P_net, r, n_total)
-    return round(capital_final, 2)
-
-def plot_evolution(mensuel, duree, frais_entree, frais_gestion, taux, taxe_lib=None, taxe_versement=0.0, montant_initial=0.0, split_60=True):
-    P_net = mensualite_nettoyee(mensuel, frais_entree, taxe_versement)
-    r = (taux - frais_gestion) / 12 / 100
-    total = montant_initial
-    capitals = []
-    for mois in range(1, duree * 12 + 1):
-        total = total * (1 + r) + P_net
-        if split_60 and mois == 37 * 12 and taxe_lib:
-            total *= (1 - taxe_lib / 100)
-        capitals.append(total)
-    return capitals
-
-age = st.slider("Age actuel", 18, 60, 23)
-duree = 67 - age
+        st.success(f"Capital median sur {resultat_bt['n_fenetres']} dates de depart : {resultat_bt['centiles'][50]:,.2f} €")
+        st.info(f"P5 : {resultat_bt['centiles'][5]:,.2f} € | P95 : {resultat_bt['centiles'][95]:,.2f} € | Rendement annuel moyen de la serie : {resultat_bt['rendement_annuel_moyen']:.2f} %")
+        st.warning(f"Pire depart : {resultat_bt['pire'][0]} ({resultat_bt['pire'][1]:,.2f} €) | Meilleur depart : {resultat_bt['meilleur'][0]} ({resultat_bt['meilleur'][1]:,.2f} €)")
+        st.line_chart(pd.Series(resultat_bt["capitaux_finaux"], index=resultat_bt["dates_debut"], name="Capital final"))
+
+
+def oublier_pdf():
+    # Champ du PDF ou chiffre modifie : le PDF soumis ne correspond plus, on l'abandonne
+    travail = st.session_state.pop("travail_pdf", None)
+    if travail:
+        file_partagee().annuler(travail)
+
+
+@st.fragment(run_every=0.5)
+def suivi_pdf():
+    # Interroge la file tant que le PDF est en preparation ; une fois termine, un rerun
+    # complet affiche le telechargement et arrete l'interrogation
+    file = file_partagee()
+    travail = file.travail(st.session_state.get("travail_pdf"))
+    if travail is None or not travail.actif:
+        st.rerun()
+    position = file.position(travail.id)
+    st.progress(travail.progression, text=f"{travail.etape} (position {position} dans la file)" if position else travail.etape)
+
+
+@st.fragment(key="pdf")
+def section_pdf():
+    ss = st.session_state
+    nom = st.text_input("Nom du client", on_change=oublier_pdf)
+    prenom = st.text_input("Prénom du client", on_change=oublier_pdf)
+    produits_selectionnes = st.multiselect("Produits à inclure dans le PDF :", PRODUITS_PDF, on_change=oublier_pdf)
+    taux_msci = st.number_input("Taux moyen historique MSCI World (%)", 0.0, 20.0, 8.53, step=0.01, on_change=oublier_pdf)
+    date_rdv = st.date_input("Date du prochain rendez-vous", on_change=oublier_pdf)
+
+    if st.button("📥 Générer le PDF récapitulatif"):
+        oublier_pdf()
+        donnees_pdf = dict(
+            prenom=prenom, nom=nom, produits=produits_selectionnes, taux_msci=taux_msci, date_rdv=date_rdv,
+            duree=AGE_TERME - champ("age"), calcul_exact=bool(ss.get("calcul_exact")),
+            # Parametres des courbes du PDF (age, montants, taux, frais), rien d'autre : un
+            # champ sans effet sur le PDF (mode d'affichage des courbes...) ne change pas sa cle
+            **{nom: champ(nom) for nom in ("age", *sorted({n for noms in PARAMETRES_GRAPHIQUE.values() for n in noms} - {"duree"}))},
+            # Chiffres deja calcules par les sections produits : lus dans le graphe sans recalcul
+            **graphe_session().valeurs(CHIFFRES_PRODUITS),
+        )
+        # Capitaux de la projection du foyer (deja en cache) pour la synthese
+        foyer = foyer_session()
+        donnees_pdf["capital_foyer"] = sum(foyer["capitaux_finaux"][produit] for produit in produits_selectionnes)
+        # Rendu en arriere-plan : le script se termine aussitot, suivi_pdf prend le relais
+        try:
+            ss["travail_pdf"] = file_partagee().soumettre(ss["id_session"], donnees_pdf)
+        except FileSaturee as erreur:
+            st.warning(str(erreur))
+
+    travail = file_partagee().travail(ss.get("travail_pdf"))
+    if travail is None:
+        return
+    if travail.actif:
+        suivi_pdf()
+    elif travail.etat == "termine":
+        st.success("📄 PDF généré avec succès !")
+        st.download_button("📥 Télécharger le PDF", travail.octets, file_name=travail.nom_fichier, mime="application/pdf")
+    else:
+        st.error(f"La generation du PDF a echoue : {travail.erreur}")
+
+
+@st.fragment(key="diagnostics")
+def section_diagnostics():
+    with st.expander("Diagnostics"):
+        calculs_rerun = sum(c["calculs"] for c in releve().values())
+        st.caption(f"Calculs effectues pendant ce rerun : {calculs_rerun}")
+        st.caption(f"Chiffres recalcules : {', '.join(graphe_session().executes) or 'aucun'}")
+        st.dataframe(pd.DataFrame(releve()).T)
+        st.dataframe(pd.DataFrame(statistiques_caches()).T)
+        st.caption(f"File des PDF : {file_partagee().statistiques()}")
+        st.caption(f"Cache des PDF : {cache_partage().statistiques()}")
+        st.caption("Chargements differes (ms)")
+        st.json(chargements_differes())
+        if st.checkbox("Mesurer les temps d'import a froid"):
+            st.dataframe(pd.Series(temps_import_a_froid(), name="ms"))
+
+
+with st.sidebar:
+    st.selectbox("Granularite de projection", list(GRANULARITES), key="granularite")
+    st.selectbox("Affichage des courbes", list(MODES_COURBE), format_func=MODES_COURBE.get, key="mode_courbes")
+    st.slider("Points par courbe", 30, 600, BUDGET_POINTS, step=10, key="points_courbes")
+    st.toggle("Calcul exact au centime", key="calcul_exact", on_change=oublier_pdf, help="Recurrence mensuelle en centimes entiers : frais, taxes et interets arrondis au centime a chaque mois. La courbe se termine exactement sur le capital affiche.")
+graphe_session().demarrer_releve()
+
+# L'age change la duree de EP et ELT : seul champ qui rejoue toute la page
+st.slider("Age actuel", 18, 60, 23, key="age", on_change=oublier_pdf)
 
 st.markdown("## Epargne Pension et Long Terme")
 col1, col2 = st.columns(2)
 with col1:
-    montant_ep = st.number_input("Montant EP mensuel (€)", 30.00, 112.50, 87.50, step=0.01)
-    taux_ep = st.number_input("Taux EP (%)", 0.00, 25.00, 5.00, step=0.01)
-    frais_entree_ep = st.number_input("Frais entree EP (%)", 0.00, 5.00, 3.00, step=0.01)
-    frais_gestion_ep = st.number_input("Frais gestion EP (%)", 0.00, 5.00, 1.90, step=0.01)
-    deduction_ep_pct = st.number_input("Deduction EP (%)", 0.00, 100.00, 30.00, step=0.01)
-    avantage_ep = round(montant_ep * 12 * deduction_ep_pct / 100, 2)
-    total_avantage_ep = round(avantage_ep * duree, 2)
-    net_mensuel_ep = round(montant_ep * (1 - deduction_ep_pct / 100), 2)
-    net_annuel_ep = round(net_mensuel_ep * 12, 2)
-    cap_ep = calculateur(montant_ep, duree, frais_entree_ep, frais_gestion_ep, taux_ep, taxe_lib=8.0)
-    st.success(f"Capital estime a 67 ans : {cap_ep:,.2f} €")
-    st.info(f"Net mensuel : {net_mensuel_ep:.2f} € | Net annuel : {net_annuel_ep:.2f} €")
-    st.warning(f"Avantage fiscal annuel : {avantage_ep:.2f} € | Total : {total_avantage_ep:.2f} €")
-    st.line_chart(plot_evolution(montant_ep, duree, frais_entree_ep, frais_gestion_ep, taux_ep, taxe_lib=8.0))
-
+    section_ep()
 with col2:
-    montant_elt = st.number_input("Montant ELT mensuel (€)", 30.00, 210.83, 100.00, step=0.01)
-    taux_elt = st.number_input("Taux ELT (%)", 0.00, 25.00, 5.00, step=0.01)
-    frais_entree_elt = st.number_input("Frais entree ELT (%)", 0.00, 5.00, 3.00, step=0.01)
-    frais_gestion_elt = st.number_input("Frais gestion ELT (%)", 0.00, 5.00, 1.00, step=0.01)
-    deduction_elt_pct = st.number_input("Deduction ELT (%)", 0.00, 100.00, 30.00, step=0.01)
-    avantage_elt = round(montant_elt * 12 * deduction_elt_pct / 100, 2)
-    total_avantage_elt = round(avantage_elt * duree, 2)
-    net_mensuel_elt = round(montant_elt * (1 - deduction_elt_pct / 100), 2)
-    net_annuel_elt = round(net_mensuel_elt * 12, 2)
-    cap_elt = calculateur(montant_elt, duree, frais_entree_elt, frais_gestion_elt, taux_elt, taxe_lib=10.0, taxe_versement=2.0)
-    st.success(f"Capital estime a 67 ans : {cap_elt:,.2f} €")
-    st.info(f"Net mensuel : {net_mensuel_elt:.2f} € | Net annuel : {net_annuel_elt:.2f} €")
-    st.warning(f"Avantage fiscal annuel : {avantage_elt:.2f} € | Total : {total_avantage_elt:.2f} €")
-    st.line_chart(plot_evolution(montant_elt, duree, frais_entree_elt, frais_gestion_elt, taux_elt, taxe_lib=10.0, taxe_versement=2.0))
+    section_elt()
 
 st.markdown("## Epargne Non Fiscale")
-col3, col4 = st.columns(2)
-with col3:
-    montant_nf = st.number_input("Montant NF mensuel (€)", 10.00, 5000.00, 150.00, step=1.00)
-    duree_nf = st.slider("Duree investissement (ans)", 1, 99, 10)
-with col4:
-    montant_initial_nf = st.number_input("Montant initial (€)", 0.00, 100000.00, 0.00, step=100.00)
-    taux_nf = st.number_input("Taux NF (%)", 0.00, 25.00, 8.00, step=0.01)
-    frais_entree_nf = st.number_input("Frais entree NF (%)", 0.00, 5.00, 3.00, step=0.01)
-    frais_gestion_nf = st.number_input("Frais gestion NF (%)", 0.00, 5.00, 1.25, step=0.01)
+section_nf()
+
+st.markdown("## Patrimoine du foyer")
+section_foyer()
 
-cap_nf = calculateur(montant_nf, duree_nf, frais_entree_nf, frais_gestion_nf, taux_nf, montant_initial_nf, taxe_versement=2.0, split_60=False)
-total_investi_nf = montant_nf * 12 * duree_nf + montant_initial_nf
-profit_nf = round(cap_nf - total_investi_nf, 2)
-st.success(f"Capital final apres {duree_nf} ans : {cap_nf:,.2f} €")
-st.info(f"Total investi : {total_investi_nf:,.2f} €")
-st.warning(f"Profit net estime : {profit_nf:,.2f} €")
-st.line_chart(plot_evolution(montant_nf, duree_nf, frais_entree_nf, frais_gestion_nf, taux_nf, montant_initial_nf, taxe_versement=2.0, split_60=False))
+st.markdown("## Objectif de capital")
+section_objectif()
 
+st.markdown("## Simulation Monte Carlo")
+section_monte_carlo()
 
+st.markdown("## Analyse de sensibilite")
+section_sensibilite()
 
-# Fonction de nettoyage pour FPDF
-def safe_text(text):
-    return text.encode("latin-1", "replace").decode("latin-1")
+st.markdown("## Backtest historique MSCI World")
+section_backtest()
 
 
 
 # PDF GENERATION
 st.markdown("---")
 st.markdown("## 📄 Générer un PDF récapitulatif personnalisé")
+section_pdf()
 
-nom = st.text_input("Nom du client")
-prenom = st.text_input("Prénom du client")
-produits_selectionnes = st.multiselect("Produits à inclure dans le PDF :", ["EP", "ELT", "Epargne non fiscale"])
-taux_msci = st.number_input("Taux moyen historique MSCI World (%)", 0.0, 20.0, 8.53, step=0.01)
-date_rdv = st.date_input("Date du prochain rendez-vous")
-
-if st.button("📥 Générer le PDF récapitulatif"):
-    pdf = FPDF()
-    pdf.add_page()
-    pdf.set_font("Arial", "", 11)
-
-    pdf.multi_cell(0, 10, safe_text(safe_text(f"Bonjour {prenom} {nom},\n\nJ'espere que vous allez bien.\n"))
-    pdf.multi_cell(0, 10, safe_text("Suite à notre récent entretien, au cours duquel nous avons réalisé une analyse approfondie de votre situation financière, et après évaluation par un conseiller agréé, je tiens à vous transmettre un récapitulatif des points essentiels abordés ainsi que des recommandations adaptées à vos besoins et à vos objectifs à long terme.\n")
-    pdf.multi_cell(0, 10, safe_text("Ces propositions s’inscrivent dans une approche personnalisée, en tenant compte des informations que vous nous avez communiquées, afin de vous accompagner au mieux dans l’optimisation et la protection de vos intérêts financiers.\n")
-
-    if "EP" in produits_selectionnes:
-        pdf.set_font("Arial", "B", 11)
-        pdf.cell(0, 10, "ÉPARGNES PENSION", ln=True)
-        pdf.set_font("Arial", "", 11)
-        pdf.multi_cell(0, 10, safe_text(f"Montants : {montant_ep:.2f} € BRUTS")
-        pdf.multi_cell(0, 10, safe_text(f"Coût net mensuel : {net_mensuel_ep:.2f} € / mois")
-        pdf.multi_cell(0, 10, safe_text(f"Déductibilité : {avantage_ep:.2f} € / an")
-        pdf.multi_cell(0, 10, safe_text(f"Durée de l'investissement - {duree} ans : âge terme - 67 ans")
-        pdf.multi_cell(0, 10, safe_text("Frais d'entrée : 3,00 %")
-        pdf.multi_cell(0, 10, safe_text("Frais de Gestion (annuels) : 1,90 % (EP/ELT Europe Equity AXA); 0,85 % (EP/ELT Multifunds AXA); 1,25 % (EP/ELT iShares P&V).")
-        pdf.multi_cell(0, 10, safe_text("Rendement attendu : Entre 5,00 % et 10,00 %.")
-        pdf.multi_cell(0, 10, safe_text(f"Dans votre cas, nous partons d'un capital investi de {(montant_ep * 12 * duree):,.2f} € pour atteindre un montant estimé de {cap_ep:,.2f} € au terme du contrat, taxes et frais compris. L'avantage fiscal perçu représente quant à lui {total_avantage_ep:,.2f} €.\n")
-
-    if "ELT" in produits_selectionnes:
-        pdf.set_font("Arial", "B", 11)
-        pdf.cell(0, 10, "ÉPARGNES LONG TERME", ln=True)
-        pdf.set_font("Arial", "", 11)
-        pdf.multi_cell(0, 10, safe_text(f"Montants : {montant_elt:.2f} € BRUTS")
-        pdf.multi_cell(0, 10, safe_text(f"Coût net mensuel : {net_mensuel_elt:.2f} € / mois")
-        pdf.multi_cell(0, 10, safe_text(f"Déductibilité : {avantage_elt:.2f} € / an")
-        pdf.multi_cell(0, 10, safe_text(f"Durée de l'investissement - {duree} ans : âge terme - 67 ans")
-        pdf.multi_cell(0, 10, safe_text("Frais d'entrée : 3,00 %")
-        pdf.multi_cell(0, 10, safe_text("Frais de Gestion (annuels) : 1,90 %, 0,85 %, 0,85 %, 0,85 %, 1,00 %, 1,25 % selon fonds sélectionnés.")
-        pdf.multi_cell(0, 10, safe_text("Rendement attendu : Entre 5,00 % et 10,00 %.")
-        pdf.multi_cell(0, 10, safe_text(f"Dans votre cas, nous partons d'un capital investi de {(montant_elt * 12 * duree):,.2f} € pour atteindre un montant estimé de {cap_elt:,.2f} € au terme du contrat, taxes et frais compris. L'avantage fiscal perçu représente quant à lui {total_avantage_elt:,.2f} €.\n")
-
-    if "Epargne non fiscale" in produits_selectionnes:
-        pdf.set_font("Arial", "B", 11)
-        pdf.cell(0, 10, "ÉPARGNE NON-FISCALE", ln=True)
-        pdf.set_font("Arial", "", 11)
-        pdf.multi_cell(0, 10, safe_text(f"Montants : {montant_nf:.2f} € BRUTS")
-        pdf.multi_cell(0, 10, safe_text("Frais d'entrée : 3,00 %")
-        pdf.multi_cell(0, 10, safe_text("Frais de Gestion (annuels) : 1,25 %")
-        pdf.multi_cell(0, 10, safe_text("Rendement attendu : Entre 8,00 % et 14,00 %.")
-        pdf.multi_cell(0, 10, safe_text(f"Durée de l'investissement - {duree_nf} ans : âge terme - {age + duree_nf} ans.")
-        pdf.multi_cell(0, 10, safe_text(f"Dans votre cas, nous partons d'un capital investi de {total_investi_nf:,.2f} € pour atteindre un montant estimé de {cap_nf:,.2f} € au terme des {duree_nf} années, taxes et frais compris.\n")
-
-    pdf.multi_cell(0, 10, safe_text(f"Je vous rappelle que ces calculs ont été réalisés sur base d'un rendement fictif de {taux_msci:.2f} %. Sur une période d'environ 30 ans, il convient plutôt d'envisager un rendement final de l'ordre de 5,00 % à 10,00 %, ces 37 dernières années le rendement étant de 8,53 % en moyenne par an (MSCI World Index).\n")
-    pdf.multi_cell(0, 10, safe_text(f"POUR NOTRE PROCHAIN RENDEZ-VOUS : {date_rdv.strftime('%A %d %B %Y')}")
-
-    file_name = f"recommandations_{prenom}_{nom}.pdf"
-    pdf.output(f"/mnt/data/{file_name}")
-    st.success("📄 PDF généré avec succès !")
-    with open(f"/mnt/data/{file_name}", "rb") as f:
-        st.download_button("📥 Télécharger le PDF", f, file_name=file_name)
+with st.sidebar:
+    section_diagnostics()
@@ -0,0 +1,84 @@
+# test_backtest.py
+# Rejeu historique sur une serie mensuelle synthetique (la serie MSCI n'est pas livree) :
+#   python -m pytest -q
+import numpy as np
+import pandas as pd
+import pytest
+
+import moteur
+from backtest import backtest_historique, charger_rendements_msci
+
+
+def serie_synthetique(n_mois=600, graine=0):
+    # Rendements mensuels en %, du meme ordre que le MSCI World (~0,7 % +/- 4 %)
+    return np.random.default_rng(graine).normal(0.7, 4.0, n_mois).round(3)
+
+
+def capital_fenetre(rendements, mensuel, duree, frais_entree, frais_gestion, taxe_lib=None, taxe_versement=0.0, montant_initial=0.0, split_60=True):
+    # Boucle mensuelle de reference sur une seule fenetre
+    P_net = moteur.mensualite_nettoyee(mensuel, frais_entree, taxe_versement)
+    split = split_60 and duree > 37
+    capital = montant_initial
+    for mois, rendement in enumerate(rendements[: duree * 12]):
+        capital *= 1 + rendement / 100 - frais_gestion / 12 / 100
+        if not split or mois < moteur.MOIS_AVANT_60:
+            capital += P_net
+        if split and mois == moteur.MOIS_AVANT_60 - 1:
+            capital *= 1 - (taxe_lib or 0) / 100
+    return capital
+
+
+@pytest.mark.parametrize("duree", [10, 37, 40])
+def test_fenetres_egales_a_la_boucle(duree):
+    rendements = serie_synthetique()
+    parametres = dict(mensuel=87.5, duree=duree, frais_entree=3.0, frais_gestion=1.9, **moteur.FISCALITE["EP"])
+    resultat = backtest_historique(rendements, **parametres)
+    # Une fenetre par mois de depart dont l'horizon tient dans l'historique
+    assert resultat["n_fenetres"] == rendements.size - duree * 12 + 1
+    attendu = [capital_fenetre(rendements[debut:], **parametres) for debut in range(resultat["n_fenetres"])]
+    np.testing.assert_allclose(resultat["capitaux_finaux"], attendu, rtol=1e-12)
+    assert resultat["centiles"] == {c: round(float(v), 2) for c, v in zip((5, 25, 50, 75, 95), np.percentile(attendu, (5, 25, 50, 75, 95)))}
+    assert resultat["pire"][1] == round(min(attendu), 2)
+    assert resultat["meilleur"][1] == round(max(attendu), 2)
+
+
+def test_rendement_constant_egal_a_calculateur():
+    # Rendement constant de taux / 12 par mois : chaque fenetre refait calculateur,
+    # split a 60 ans compris (taxe a 37 ans, plus de versements ensuite)
+    rendements = np.full(600, 6.0 / 12)
+    for duree in (20, 37, 38, 45):
+        resultat = backtest_historique(rendements, 100.0, duree, 3.0, 1.0, **moteur.FISCALITE["ELT"])
+        attendu = moteur.calculateur(100.0, duree, 3.0, 1.0, 6.0, **moteur.FISCALITE["ELT"])
+        assert list(resultat["centiles"].values()) == pytest.approx([attendu] * 5, abs=0.01)
+
+
+def test_split_60_taxe_et_arret_des_versements():
+    rendements = serie_synthetique(graine=1)
+    commun = dict(mensuel=100.0, duree=45, frais_entree=3.0, frais_gestion=1.0, taxe_versement=2.0)
+    avec_split = backtest_historique(rendements, taxe_lib=10.0, **commun)["capitaux_finaux"]
+    sans_split = backtest_historique(rendements, taxe_lib=10.0, split_60=False, **commun)["capitaux_finaux"]
+    np.testing.assert_allclose(avec_split, [capital_fenetre(rendements[debut:], taxe_lib=10.0, **commun) for debut in range(avec_split.size)], rtol=1e-12)
+    # Sans split : ni taxe ni arret des versements a 60 ans
+    np.testing.assert_allclose(sans_split, [capital_fenetre(rendements[debut:], split_60=False, **commun) for debut in range(sans_split.size)], rtol=1e-12)
+    assert np.all(avec_split < sans_split)
+
+
+def test_historique_trop_court():
+    with pytest.raises(ValueError, match="Historique trop court"):
+        backtest_historique(serie_synthetique(100), 87.5, 10, 3.0, 1.9)
+
+
+def test_chargement_csv_trie_et_nettoie(tmp_path):
+    chemin = tmp_path / "msci.csv"
+    pd.DataFrame({"date": ["2001-02-28", "2001-01-31", "2001-03-31"], "rendement": [1.5, -2.0, None], "autre": [0, 0, 0]}).to_csv(chemin, index=False)
+    serie = charger_rendements_msci(chemin)
+    assert list(serie.columns) == ["date", "rendement"]
+    assert serie["rendement"].tolist() == [-2.0, 1.5]
+    assert serie["date"].is_monotonic_increasing
+
+
+def test_chargement_parquet(tmp_path):
+    pytest.importorskip("pyarrow")
+    chemin = tmp_path / "msci.parquet"
+    pd.DataFrame({"date": pd.to_datetime(["2001-01-31", "2001-02-28"]), "rendement": [-2.0, 1.5]}).to_parquet(chemin)
+    assert charger_rendements_msci(chemin)["rendement"].tolist() == [-2.0, 1.5]
@@ -0,0 +1,63 @@
+# test_export_echeancier.py
+# Echeanciers mensuels : meme modele que les chiffres du foyer (calculateur)
+#   python -m pytest -q
+import importlib.util
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import export_echeancier
+from export_echeancier import COLONNES_ECHEANCIER, echeancier_octets, echeancier_par_blocs, formats_disponibles
+from moteur import AGE_TERME, FISCALITE, MOIS_AVANT_60, calculateur_batch
+
+
+def clients_aleatoires(n=500, graine=0):
+    rng = np.random.default_rng(graine)
+    age = rng.integers(18, 61, n).astype(np.float64)
+    parametres = dict(
+        mensuel=rng.uniform(30.0, 112.5, n).round(2), duree=AGE_TERME - age, frais_entree=rng.uniform(0.0, 5.0, n).round(2),
+        frais_gestion=rng.uniform(0.5, 2.5, n).round(2), taux_interet=rng.uniform(0.0, 10.0, n).round(2), **FISCALITE["ELT"],
+    )
+    return parametres, age
+
+
+def test_derniere_ligne_egale_a_calculateur_batch():
+    parametres, age = clients_aleatoires()
+    # Petits blocs : plusieurs DataFrame, chacun avec son propre calcul des termes
+    echeancier = pd.concat(echeancier_par_blocs(parametres, age, lignes_par_bloc=20_000))
+    derniers = echeancier.groupby("client").tail(1)
+    assert derniers["mois"].tolist() == (parametres["duree"] * 12).astype(int).tolist()
+    assert derniers["capital"].tolist() == calculateur_batch(**parametres).tolist()
+
+
+def test_plus_de_versements_apres_60_ans():
+    parametres = dict(mensuel=87.5, duree=44, frais_entree=3.0, frais_gestion=1.9, taux_interet=5.0, **FISCALITE["EP"])
+    echeancier = next(echeancier_par_blocs(parametres, 23))
+    apres_60 = echeancier["mois"] > MOIS_AVANT_60
+    assert (echeancier.loc[apres_60, ["versement", "versement_net"]] == 0).all().all()
+    assert (echeancier.loc[~apres_60, "versement"] == 87.5).all()
+    assert echeancier.loc[echeancier["mois"] == MOIS_AVANT_60, "taxe"].item() > 0
+    # Sans split (37 ans au plus) : versements jusqu'au terme
+    court = next(echeancier_par_blocs(dict(parametres, duree=37), 30))
+    assert (court["versement"] == 87.5).all()
+    assert court["capital"].iloc[-1] == calculateur_batch(**dict(parametres, duree=37))
+
+
+def test_csv_sans_pyarrow(monkeypatch):
+    parametres = dict(mensuel=150.0, duree=10, frais_entree=3.0, frais_gestion=1.25, taux_interet=8.0, montant_initial=1000.0, **FISCALITE["NF"])
+    attendu = next(echeancier_par_blocs(parametres, 40))
+    recherche = importlib.util.find_spec
+    monkeypatch.setattr(export_echeancier.importlib.util, "find_spec", lambda nom: None if nom == "pyarrow" else recherche(nom))
+    assert "parquet" not in formats_disponibles()
+    lu = pd.read_csv(io.BytesIO(echeancier_octets(parametres, 40, "csv")))
+    assert list(lu.columns) == list(COLONNES_ECHEANCIER)
+    pd.testing.assert_frame_equal(lu, attendu, check_dtype=False)
+
+
+def test_parquet():
+    pytest.importorskip("pyarrow")
+    parametres = dict(mensuel=150.0, duree=10, frais_entree=3.0, frais_gestion=1.25, taux_interet=8.0, **FISCALITE["NF"])
+    lu = pd.read_parquet(io.BytesIO(echeancier_octets(parametres, 40, "parquet")))
+    pd.testing.assert_frame_equal(lu, next(echeancier_par_blocs(parametres, 40)))
@@ -0,0 +1,68 @@
+# test_graphiques_pdf.py
+# Courbes du PDF recapitulatif : le dernier point est le capital imprime au-dessus
+#   python -m pytest -q
+import datetime
+
+import pytest
+
+pytest.importorskip("matplotlib")
+pytest.importorskip("PIL")
+
+import graphiques_pdf
+from graphiques_pdf import PARAMETRES_GRAPHIQUE, FISCALITE_PRODUIT, graphique_produit, png_courbe
+from moteur import FISCALITE, calculateur, calculateur_exact
+from recap_pdf import recap_pdf_octets
+
+# Valeurs par defaut de l'application (age 23 : duree de 44 ans, split a 60 ans)
+DONNEES = dict(
+    age=23, duree=44, duree_nf=20,
+    montant_ep=87.5, frais_entree_ep=3.0, frais_gestion_ep=1.9, taux_ep=5.0,
+    montant_elt=100.0, frais_entree_elt=3.0, frais_gestion_elt=1.0, taux_elt=5.0,
+    montant_nf=100.0, frais_entree_nf=3.0, frais_gestion_nf=1.25, taux_nf=8.0, montant_initial_nf=1000.0,
+)
+
+
+def capital_imprime(produit, exact=False):
+    mensuel, duree, frais_entree, frais_gestion, taux, *montant_initial = (DONNEES[nom] for nom in PARAMETRES_GRAPHIQUE[produit])
+    fonction = calculateur_exact if exact else calculateur
+    return fonction(mensuel, duree, frais_entree, frais_gestion, taux, montant_initial=montant_initial[0] if montant_initial else 0.0, **FISCALITE[FISCALITE_PRODUIT[produit]])
+
+
+@pytest.mark.parametrize("exact", [False, True])
+@pytest.mark.parametrize("produit", list(PARAMETRES_GRAPHIQUE))
+def test_dernier_point_egal_au_capital_imprime(produit, exact):
+    png_courbe(produit, DONNEES["age"], *(DONNEES[nom] for nom in PARAMETRES_GRAPHIQUE[produit]), exact=exact)
+    _, _, _, courbe, _, _ = graphiques_pdf._figure()
+    ages, capital = courbe.get_data()
+    assert ages[-1] == DONNEES["age"] + DONNEES[PARAMETRES_GRAPHIQUE[produit][1]]
+    assert capital[-1] == capital_imprime(produit, exact)
+
+
+def test_pas_de_versements_apres_60_ans():
+    # Modele de calculateur : apres la taxe de 60 ans, le capital ne croit plus que des interets
+    mois, capital, taxe_60 = graphiques_pdf.courbe_produit("EP", *(DONNEES[nom] for nom in PARAMETRES_GRAPHIQUE["EP"]))
+    assert taxe_60 > 0
+    # Avant le dernier point, arrondi au centime comme calculateur
+    croissance = capital[-2] / capital[-3]
+    assert croissance == pytest.approx(1 + (5.0 - 1.9) / 12 / 100, rel=1e-12)
+
+
+def test_png_en_memoire_et_pdf():
+    pytest.importorskip("fpdf")
+    octets = graphique_produit("ELT", DONNEES)
+    assert octets.startswith(b"\x89PNG")
+    # Deuxieme appel : meme PNG, servi par le cache sans nouveau rendu
+    rendus = graphiques_pdf.statistiques()["rendus"]
+    assert graphique_produit("ELT", DONNEES) is octets
+    assert graphiques_pdf.statistiques()["rendus"] == rendus
+    # Le mode exact est une autre courbe
+    assert graphique_produit("ELT", dict(DONNEES, calcul_exact=True)) is not octets
+    assert graphique_produit("ELT", {"age": 23}) is None
+    recap = dict(
+        DONNEES, prenom="A", nom="B", produits=list(PARAMETRES_GRAPHIQUE), taux_msci=8.53,
+        date_rdv=datetime.date(2026, 1, 5),
+        net_mensuel_ep=0.0, avantage_ep=0.0, cap_ep=0.0, total_avantage_ep=0.0,
+        net_mensuel_elt=0.0, avantage_elt=0.0, cap_elt=0.0, total_avantage_elt=0.0,
+        total_investi_nf=0.0, cap_nf=0.0,
+    )
+    assert recap_pdf_octets(recap).startswith(b"%PDF")
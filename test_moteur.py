@@ -0,0 +1,203 @@
+# test_moteur.py
+# Equivalences du moteur vectorise avec les calculs scalaires d'origine :
+#   python -m pytest -q
+import subprocess
+import sys
+from math import pow
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+import moteur
+from projection import projeter_exact, projeter_foyer
+
+# Cas limites : split a 37 ans (pas de taxe) et 38 ans (taxe), r = 0, r < 0, duree 1 an
+CAS_LIMITES = [
+    dict(mensuel=87.5, duree=37, frais_entree=3.0, frais_gestion=1.9, taux_interet=5.0, taxe_lib=8.0),
+    dict(mensuel=87.5, duree=38, frais_entree=3.0, frais_gestion=1.9, taux_interet=5.0, taxe_lib=8.0),
+    dict(mensuel=100.0, duree=44, frais_entree=3.0, frais_gestion=1.0, taux_interet=5.0, taxe_lib=10.0, taxe_versement=2.0),
+    dict(mensuel=150.0, duree=99, frais_entree=3.0, frais_gestion=1.25, taux_interet=8.0, taxe_versement=2.0, montant_initial=5000.0, split_60=False),
+    dict(mensuel=150.0, duree=1, frais_entree=0.0, frais_gestion=2.0, taux_interet=1.0, taxe_versement=2.0, split_60=False),
+    dict(mensuel=112.5, duree=49, frais_entree=5.0, frais_gestion=5.0, taux_interet=0.0, taxe_lib=8.0),
+]
+
+
+def plot_evolution_boucle(mensuel, duree, frais_entree, frais_gestion, taux, taxe_lib=None, taxe_versement=0.0, montant_initial=0.0, split_60=True):
+    # Boucle mensuelle d'origine de plot_evolution (simulateur v17 avant le moteur)
+    P_net = moteur.mensualite_nettoyee(mensuel, frais_entree, taxe_versement)
+    r = (taux - frais_gestion) / 12 / 100
+    total = montant_initial
+    capitals = []
+    for mois in range(1, duree * 12 + 1):
+        total = total * (1 + r) + P_net
+        if split_60 and mois == 37 * 12 and taxe_lib:
+            total *= (1 - taxe_lib / 100)
+        capitals.append(total)
+    return capitals
+
+
+def calculateur_limite(mensuel, duree, frais_entree, frais_gestion, taux_interet, taxe_lib=None, taxe_versement=0.0, montant_initial=0.0, split_60=True):
+    # calculateur avec r = 0 remplace par sa limite (le scalaire divise par zero)
+    P_net = moteur.mensualite_nettoyee(mensuel, frais_entree, taxe_versement)
+    r = (taux_interet - frais_gestion) / 12 / 100
+    if r:
+        return moteur.calculateur(mensuel, duree, frais_entree, frais_gestion, taux_interet, taxe_lib, taxe_versement, montant_initial, split_60)
+    if split_60 and duree > 37:
+        return round((montant_initial + P_net * 444) * (1 - (taxe_lib or 0) / 100), 2)
+    return round(montant_initial + P_net * (duree * 12), 2)
+
+
+def portefeuille(n, graine=0):
+    rng = np.random.default_rng(graine)
+    return dict(
+        mensuel=rng.uniform(10.0, 5000.0, n).round(2),
+        duree=rng.integers(1, 100, n).astype(np.float64),
+        frais_entree=rng.uniform(0.0, 5.0, n).round(2),
+        frais_gestion=rng.uniform(0.0, 5.0, n).round(2),
+        taux_interet=rng.uniform(0.0, 25.0, n).round(2),
+        taxe_lib=rng.choice([0.0, 8.0, 10.0], n),
+        taxe_versement=rng.choice([0.0, 2.0], n),
+        montant_initial=rng.uniform(0.0, 100_000.0, n).round(-2),
+        split_60=rng.random(n) < 0.7,
+    )
+
+
+def test_calculateur_batch_egal_au_scalaire():
+    p = portefeuille(20_000)
+    lignes = [dict(zip(p, valeurs)) for valeurs in zip(*(v.tolist() for v in p.values()))]
+    attendu = [calculateur_limite(**ligne) for ligne in lignes]
+    assert moteur.calculateur_batch(**p).tolist() == attendu
+
+
+@pytest.mark.parametrize("cas", CAS_LIMITES)
+def test_calculateur_batch_cas_limites(cas):
+    assert float(moteur.calculateur_batch(**cas)) == calculateur_limite(**cas)
+
+
+def test_calculateur_batch_diffusion():
+    # Scalaires et colonnes melanges : une ligne par taux, meme resultat ligne a ligne
+    taux = np.array([0.0, 1.9, 5.0, 25.0])
+    capitaux = moteur.calculateur_batch(87.5, 44, 3.0, 1.9, taux, **moteur.FISCALITE["EP"])
+    assert capitaux.shape == (4,)
+    assert capitaux.tolist() == [calculateur_limite(87.5, 44, 3.0, 1.9, t, **moteur.FISCALITE["EP"]) for t in taux.tolist()]
+
+
+def test_arrondi_centimes_egal_a_round():
+    rng = np.random.default_rng(1)
+    # Grands capitaux compris : au-dela de 2^52 centimes, x * 100 n'est plus un entier exact
+    x = np.concatenate([rng.uniform(-1e7, 1e7, 100_000), rng.uniform(-1e15, 1e15, 10_000), np.arange(-5000, 5000) / 1000 + 0.005, [0.0, 1.005, 2.675]])
+    assert moteur.arrondi_centimes(x).tolist() == [round(v, 2) for v in x.tolist()]
+
+
+@pytest.mark.parametrize("cas", CAS_LIMITES)
+def test_courbe_forme_fermee_egale_a_la_boucle(cas):
+    cas = dict(cas)
+    cas["taux"] = cas.pop("taux_interet")
+    attendu = np.array(plot_evolution_boucle(**cas))
+    courbe = moteur.plot_evolution(**cas)
+    assert courbe.shape == attendu.shape
+    np.testing.assert_allclose(courbe, attendu, rtol=1e-9)
+
+
+def test_courbes_en_lot_egales_a_la_boucle():
+    p = portefeuille(300, graine=2)
+    p["taux"] = p.pop("taux_interet")
+    courbes = moteur.courbe_evolution(**p)
+    for i in range(len(courbes)):
+        attendu = plot_evolution_boucle(**{nom: valeurs[i].item() for nom, valeurs in p.items()} | {"duree": int(p["duree"][i])})
+        np.testing.assert_allclose(courbes[i, :len(attendu)], attendu, rtol=1e-9)
+        assert np.isnan(courbes[i, len(attendu):]).all()
+
+
+@pytest.mark.parametrize("cas", CAS_LIMITES)
+def test_projection_exacte_finit_sur_calculateur_exact(cas):
+    cas = dict(cas)
+    taux = cas.pop("taux_interet")
+    for pas in moteur.GRANULARITES.values():
+        projection = projeter_exact(taux=taux, pas=pas, **cas)
+        assert projection.capital_final == float(moteur.calculateur_exact(taux_interet=taux, **cas))
+
+
+def test_facteur_annuite_sans_division_par_zero():
+    assert moteur.future_value_annuity_batch(100.0, 0.0, 12) == 1200.0
+    assert moteur.future_value_annuity_batch(100.0, 0.01, 12) == pytest.approx(100.0 * (pow(1.01, 12) - 1) / 0.01, rel=1e-15)
+
+
+def test_taux_requis():
+    # Objectif deja atteint a 0 % : aucun rendement requis
+    assert float(moteur.taux_requis(1000, 100, 10, 3, 1.9, taxe_lib=8)) == 0.0
+    # Hors d'atteinte meme a 50 % (EP a 60 ans, 10 M€)
+    assert np.isnan(moteur.taux_requis(10_000_000, moteur.PLAFONDS_MENSUELS["EP"], 7, 3, 1.9, taxe_lib=8))
+    taux = float(moteur.taux_requis(100_000, 87.5, 44, 3, 1.9, taxe_lib=8))
+    assert moteur.calculateur(87.5, 44, 3, 1.9, taux, taxe_lib=8) == pytest.approx(100_000, rel=1e-6)
+
+
+def test_mensualite_requise():
+    assert float(moteur.mensualite_requise(1000, 10, 3, 1.25, 8, taxe_versement=2, montant_initial=5000, split_60=False)) == 0.0
+    mensuel = float(moteur.mensualite_requise(100_000, 44, 3, 1.9, 5, taxe_lib=8))
+    assert moteur.calculateur(mensuel, 44, 3, 1.9, 5, taxe_lib=8) == pytest.approx(100_000, abs=0.01)
+
+
+# Bornes des champs de saisie : NF 5000 € / mois, 100 000 € initial, 99 ans, 25 %
+LIMITES_NF = dict(mensuel=5000.0, duree=99, frais_entree=0.0, frais_gestion=0.0, taxe_versement=2.0, montant_initial=100_000.0, split_60=False)
+
+
+@pytest.mark.parametrize("taux", [8.0, 20.0, 25.0])
+def test_calcul_exact_sans_depassement_aux_limites(taux):
+    exact = float(moteur.calculateur_exact(taux_interet=taux, **LIMITES_NF))
+    assert exact == pytest.approx(float(moteur.calculateur_batch(taux_interet=taux, **LIMITES_NF)), rel=1e-6)
+    projection = projeter_exact(taux=taux, **LIMITES_NF)
+    assert projection.capital_final == exact
+    assert np.all(np.diff(projection.capital) > 0)
+
+
+def test_calcul_exact_lot_mixte():
+    # Contrats en int64 et en entiers Python dans le meme bloc : memes resultats qu'un par un
+    taux = np.array([5.0, 25.0, 8.0, 25.0])
+    lot = moteur.calculateur_exact(taux_interet=taux, **LIMITES_NF)
+    assert lot.tolist() == [float(moteur.calculateur_exact(taux_interet=t, **LIMITES_NF)) for t in taux.tolist()]
+
+
+def test_calcul_exact_proche_du_flottant():
+    # Versement net arrondi au centime : jusqu'a 0,05 % d'ecart sur un versement de 10 €
+    p = portefeuille(2000, graine=3)
+    np.testing.assert_allclose(moteur.calculateur_exact(**p), moteur.calculateur_batch(**p), rtol=1e-3)
+
+
+def parametres_foyer(age=23, **nf):
+    # Valeurs par defaut des champs de l'application
+    return {
+        "EP": dict(mensuel=87.5, duree=moteur.AGE_TERME - age, frais_entree=3.0, frais_gestion=1.9, taux_interet=5.0, **moteur.FISCALITE["EP"]),
+        "ELT": dict(mensuel=100.0, duree=moteur.AGE_TERME - age, frais_entree=3.0, frais_gestion=1.0, taux_interet=5.0, **moteur.FISCALITE["ELT"]),
+        "Epargne non fiscale": dict(dict(mensuel=150.0, duree=10, frais_entree=3.0, frais_gestion=1.25, taux_interet=8.0, **moteur.FISCALITE["NF"]), **nf),
+    }
+
+
+@pytest.mark.parametrize("age", [23, 30, 59, 60])
+@pytest.mark.parametrize("exact", [False, True])
+def test_foyer_empilement_egal_au_total(age, exact):
+    parametres = parametres_foyer(age, duree=99, montant_initial=5000.0)
+    calcul = moteur.calculateur_exact if exact else moteur.calculateur_batch
+    for pas in moteur.GRANULARITES.values():
+        foyer = projeter_foyer(parametres, pas, exact)
+        assert foyer["total"][-1] == foyer["capital_total"]
+        assert foyer["capitaux_finaux"] == {produit: float(calcul(**p)) for produit, p in parametres.items()}
+        # Chaque courbe finit sur son capital final et le garde ensuite
+        for courbe, produit in zip(foyer["empilement"], foyer["produits"]):
+            assert np.all(courbe[foyer["mois"] >= foyer["horizons"][produit]] == foyer["capitaux_finaux"][produit])
+
+
+def test_foyer_courbes_semantique_de_calculateur():
+    # Plus de versements apres 60 ans : la courbe flottante suit la recurrence en centimes
+    parametres = parametres_foyer()
+    flottant, exact = projeter_foyer(parametres), projeter_foyer(parametres, exact=True)
+    np.testing.assert_allclose(flottant["empilement"], exact["empilement"], rtol=1e-3)
+    assert flottant["capital_total"] == pytest.approx(219_637.99, abs=0.01)
+
+
+def test_import_sans_numpy():
+    # Proxy _NumpyDiffere : importer moteur et appeler calculateur ne chargent pas numpy
+    code = "import sys, moteur; moteur.calculateur(87.5, 44, 3.0, 1.9, 5.0, 8.0); print('numpy' in sys.modules)"
+    sortie = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, cwd=Path(moteur.__file__).parent, check=True)
+    assert sortie.stdout.strip() == "False"